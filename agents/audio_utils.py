@@ -1,9 +1,8 @@
-import os
-from elevenlabs.client import ElevenLabs
 from elevenlabs.play import play
+from agents.clients import get_elevenlabs_client
 
 def generate_and_play_audio(narration: str, voice_id="pNInz6obpgDQGcFmaJgB"):
-    elevenlabs = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
+    elevenlabs = get_elevenlabs_client()
     audio = elevenlabs.text_to_speech.convert(
         text=narration,
         voice_id=voice_id,
@@ -0,0 +1,149 @@
+"""
+Process-wide registry of shared API clients.
+
+Every agent obtains its OpenAI, LangChain, ElevenLabs and Redis clients from here
+so that connection pools, keep-alive connections and TLS sessions are reused
+across calls and across Streamlit sessions instead of being rebuilt per call.
+"""
+
+import os
+import json
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_clients: Dict[Any, Any] = {}
+
+
+def _get_or_create(key, factory):
+    """Return the client stored under ``key``, building it once if needed."""
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        if key not in _clients:
+            _clients[key] = factory()
+            logger.info(f"Created shared client {key[0]}")
+        return _clients[key]
+
+
+def get_http_client(provider: str) -> "httpx.Client":
+    """
+    Get the pooled HTTP client for a provider.
+
+    Pool sizes are configured with ``HTTP_POOL_MAX_CONNECTIONS``,
+    ``HTTP_POOL_MAX_KEEPALIVE`` and ``HTTP_KEEPALIVE_EXPIRY`` (seconds).
+
+    Args:
+        provider: Name of the API provider, one pool per provider
+
+    Returns:
+        Shared httpx.Client with keep-alive enabled
+    """
+    import httpx
+
+    def factory():
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", 20)),
+            max_keepalive_connections=int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", 10)),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 60)),
+        )
+        return httpx.Client(limits=limits, timeout=httpx.Timeout(120.0, connect=10.0))
+
+    return _get_or_create(("http", provider), factory)
+
+
+def get_openai_client(api_key: Optional[str] = None):
+    """Get the shared OpenAI client for ``api_key`` (defaults to ``OPENAI_API_KEY``)."""
+    from openai import OpenAI
+
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    return _get_or_create(
+        ("openai", api_key),
+        # Retries are handled by agents.rate_limit
+        lambda: OpenAI(api_key=api_key, http_client=get_http_client("openai"), max_retries=0),
+    )
+
+
+def get_chat_model(model: str = "gpt-4o-mini", temperature: float = 0.3, **kwargs):
+    """
+    Get a shared LangChain chat model.
+
+    Args:
+        model: OpenAI chat model name
+        temperature: Sampling temperature
+        **kwargs: Extra ChatOpenAI arguments; must be JSON-serializable
+
+    Returns:
+        ChatOpenAI instance shared by all callers with the same settings
+    """
+    from langchain_openai import ChatOpenAI
+
+    key = ("chat", model, temperature, json.dumps(kwargs, sort_keys=True))
+    return _get_or_create(
+        key,
+        lambda: ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            http_client=get_http_client("openai"),
+            max_retries=0,
+            **kwargs,
+        ),
+    )
+
+
+def get_embeddings(model: str = "text-embedding-3-large"):
+    """Get a shared LangChain OpenAI embeddings client."""
+    from langchain_openai import OpenAIEmbeddings
+
+    return _get_or_create(
+        ("embeddings", model),
+        # Retries are handled by agents.rate_limit
+        lambda: OpenAIEmbeddings(model=model, http_client=get_http_client("openai"), max_retries=0),
+    )
+
+
+def get_redis_client(decode_responses: bool = True):
+    """
+    Get a shared Redis client configured from ``REDIS_HOST``, ``REDIS_PORT``
+    and ``REDIS_PASSWORD``.
+
+    Args:
+        decode_responses: Return str instead of bytes
+
+    Returns:
+        redis.Redis instance (its connection pool is thread-safe)
+
+    Raises:
+        redis.exceptions.ConnectionError: If Redis is unreachable
+    """
+    import redis
+
+    def factory():
+        client = redis.Redis(
+            host=os.getenv("REDIS_HOST"),
+            port=int(os.getenv("REDIS_PORT")),
+            password=os.getenv("REDIS_PASSWORD"),
+            decode_responses=decode_responses,
+        )
+        client.ping()
+        return client
+
+    return _get_or_create(("redis", decode_responses), factory)
+
+
+def get_elevenlabs_client(api_key: Optional[str] = None):
+    """Get the shared ElevenLabs client (defaults to ``ELEVENLABS_API_KEY``)."""
+    from elevenlabs.client import ElevenLabs
+
+    api_key = api_key or os.getenv("ELEVENLABS_API_KEY")
+    return _get_or_create(
+        ("elevenlabs", api_key),
+        lambda: ElevenLabs(api_key=api_key, httpx_client=get_http_client("elevenlabs")),
+    )
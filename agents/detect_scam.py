@@ -9,21 +9,143 @@ import re
 import base64
 import logging
 import tempfile
-from typing import Dict, List, Optional, Tuple
-from PIL import Image, ImageDraw, ImageFont
-import numpy as np
-from openai import OpenAI
+from typing import Dict, Iterator, List, Optional, Tuple
+from agents.clients import get_openai_client
+from agents.rate_limit import get_rate_limiter, estimate_tokens
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Approximate tokens counted for one high-detail image input
+IMAGE_TOKEN_ESTIMATE = 1105
+
+class IncrementalJSONParser:
+    """Parses the top-level fields of a JSON object as it is streamed in."""
+    
+    def __init__(self):
+        """Initialize an empty parser."""
+        self.buffer = ""
+        self.fields: Dict = {}
+        self.complete = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start: Optional[int] = None
+    
+    def feed(self, chunk: str) -> Dict:
+        """
+        Consume the next chunk of streamed text.
+        
+        Text before the opening brace (e.g. a markdown fence) is ignored.
+        
+        Args:
+            chunk: Next piece of the model output
+            
+        Returns:
+            Dictionary of top-level fields completed by this chunk
+        """
+        self.buffer += chunk
+        new_fields = {}
+        
+        while self._pos < len(self.buffer) and not self.complete:
+            ch = self.buffer[self._pos]
+            
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._member_start = self._pos + 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit_member(self._pos, new_fields)
+                    self.complete = True
+            elif ch == "," and self._depth == 1:
+                self._emit_member(self._pos, new_fields)
+                self._member_start = self._pos + 1
+            
+            self._pos += 1
+        
+        return new_fields
+    
+    def _emit_member(self, end: int, new_fields: Dict):
+        """Parse the ``"key": value`` member ending at ``end``."""
+        member = self.buffer[self._member_start:end].strip()
+        if not member:
+            return
+        try:
+            parsed = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            logger.warning(f"Skipping unparseable JSON member: {member[:50]}")
+            return
+        new_fields.update(parsed)
+        self.fields.update(parsed)
+
+# Structured-output schema for the combined OCR + classification call
+COMBINED_ANALYSIS_SCHEMA = {
+    "name": "scam_image_analysis",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "extracted_text": {"type": "string"},
+            "risk_level": {"type": "string", "enum": ["Low", "Medium", "High"]},
+            "confidence": {"type": "integer"},
+            "scam_type": {"type": "string"},
+            "category": {"type": "string"},
+            "scam_phrases": {"type": "array", "items": {"type": "string"}},
+            "analysis": {"type": "string"}
+        },
+        "required": [
+            "extracted_text", "risk_level", "confidence", "scam_type",
+            "category", "scam_phrases", "analysis"
+        ],
+        "additionalProperties": False
+    }
+}
+
+def is_fallback_result(result: Dict) -> bool:
+    """Whether a detection result stands in for a failed analysis, and must not be reused."""
+    return bool(result.get("is_fallback"))
+
+
 class ScamDetector:
     """Enhanced scam detection with OCR and text highlighting capabilities."""
     
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize the ScamDetector with OpenAI client."""
-        self.client = OpenAI(api_key=api_key or os.getenv('OPENAI_API_KEY'))
+    def __init__(self, api_key: Optional[str] = None, combined_mode: Optional[bool] = None):
+        """
+        Initialize the ScamDetector with the shared OpenAI client.
+        
+        Args:
+            api_key: OpenAI API key, defaults to ``OPENAI_API_KEY``
+            combined_mode: Use a single vision call for OCR and classification in
+                ``analyze_image``; defaults to ``SCAM_DETECTOR_COMBINED_MODE``
+        """
+        self.client = get_openai_client(api_key)
+        self.rate_limiter = get_rate_limiter("openai")
+        if combined_mode is None:
+            combined_mode = os.getenv("SCAM_DETECTOR_COMBINED_MODE", "").lower() in ("1", "true", "yes")
+        self.combined_mode = combined_mode
+    
+    def _image_data_uri(self, image_bytes: bytes) -> str:
+        """Encode image bytes as a base64 data URI."""
+        # Convert to base64 with proper encoding
+        img_b64 = base64.b64encode(image_bytes).decode("utf-8")
+        
+        # Create data URI
+        return f"data:image/jpeg;base64,{img_b64}"
         
     def ocr_with_openai(self, image_bytes: bytes) -> str:
         """
@@ -44,11 +166,7 @@ class ScamDetector:
             if not image_bytes:
                 raise ValueError("Image bytes cannot be empty")
                 
-            # Convert to base64 with proper encoding
-            img_b64 = base64.b64encode(image_bytes).decode("utf-8")
-            
-            # Create data URI
-            data_uri = f"data:image/jpeg;base64,{img_b64}"
+            data_uri = self._image_data_uri(image_bytes)
             
             # Prepare messages with enhanced system prompt
             messages = [
@@ -75,12 +193,14 @@ class ScamDetector:
                 }
             ]
             
-            # Make API call with retry logic
-            response = self.client.chat.completions.create(
+            # Make API call with rate limiting and retry logic
+            response = self.rate_limiter.call(
+                self.client.chat.completions.create,
                 model="gpt-4o-mini",
                 messages=messages,
                 temperature=0,
-                max_tokens=2000
+                max_tokens=2000,
+                tokens=IMAGE_TOKEN_ESTIMATE + 2000
             )
             
             extracted_text = response.choices[0].message.content.strip()
@@ -96,6 +216,59 @@ class ScamDetector:
             logger.error(f"OCR failed: {str(e)}")
             raise Exception(f"Failed to extract text from image: {str(e)}")
 
+    def _empty_text_result(self) -> Dict:
+        """Result returned when there is no text to analyze."""
+        return {
+            "scam_phrases": [],
+            "risk_level": "Low",
+            "confidence": 0,
+            "analysis": "No text found to analyze",
+            "scam_type": "Unknown",
+            "category": "Unknown"
+        }
+
+    def _detection_messages(self, extracted_text: str) -> List[Dict]:
+        """Build the chat messages for scam detection."""
+        # Enhanced system prompt for better scam detection
+        system_prompt = (
+            "You are a cybersecurity expert specializing in scam detection. "
+            "Analyze text for common scam indicators including: urgency tactics, "
+            "suspicious URLs, fake offers, phishing attempts, social engineering, "
+            "grammar/spelling errors typical of scams, requests for personal info, "
+            "cryptocurrency schemes, and fake authority claims. "
+            "If scam_type is not applicable, set it to 'Unknown'."
+        )
+        
+        # Short verdict fields come first so streaming clients can show them early
+        user_prompt = (
+            f"Analyze this text for scam indicators and return a JSON response with these keys, in this order:\n"
+            f"- 'risk_level': 'Low', 'Medium', or 'High'\n"
+            f"- 'confidence': confidence score (0-100)\n"
+            f"- 'scam_type': scam type detected\n"
+            f"- 'category': which sector this scam is targeting\n"
+            f"- 'scam_phrases': array of specific suspicious phrases found\n"
+            f"- 'analysis': brief explanation of findings\n\n"
+            f"Text to analyze: {extracted_text}"
+        )
+        
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _parse_detection_response(self, raw_content: str, extracted_text: str) -> Dict:
+        """Extract the JSON object from a model response, falling back on failure."""
+        json_match = re.search(r'\{.*\}', raw_content, re.DOTALL)
+        if json_match:
+            json_text = json_match.group()
+            try:
+                return json.loads(json_text)
+            except json.JSONDecodeError as e:
+                logger.error(f"JSON decode error: {e}")
+                return self._create_fallback_result(extracted_text)
+        logger.warning("No JSON found in OpenAI response")
+        return self._create_fallback_result(extracted_text)
+
     def detect_scam_text(self, extracted_text: str) -> Dict:
         """
         Detect scam phrases and analyze risk level using OpenAI.
@@ -108,63 +281,23 @@ class ScamDetector:
         """
         try:
             if not extracted_text.strip():
-                return {
-                    "scam_phrases": [],
-                    "risk_level": "Low",
-                    "confidence": 0,
-                    "analysis": "No text found to analyze",
-                    "scam_type": "Unknown",
-                    "category": "Unknown"
-                }
-            
-            # Enhanced system prompt for better scam detection
-            system_prompt = (
-                "You are a cybersecurity expert specializing in scam detection. "
-                "Analyze text for common scam indicators including: urgency tactics, "
-                "suspicious URLs, fake offers, phishing attempts, social engineering, "
-                "grammar/spelling errors typical of scams, requests for personal info, "
-                "cryptocurrency schemes, and fake authority claims. "
-                "If scam_type is not applicable, set it to 'Unknown'."
-            )
-            
-            user_prompt = (
-                f"Analyze this text for scam indicators and return a JSON response with:\n"
-                f"- 'scam_phrases': array of specific suspicious phrases found\n"
-                f"- 'risk_level': 'Low', 'Medium', or 'High'\n"
-                f"- 'confidence': confidence score (0-100)\n"
-                f"- 'analysis': brief explanation of findings\n"
-                f"- 'scam_type': scam type detected\n"
-                f"- 'category': which sector this scam is targeting\n\n"
-                f"Text to analyze: {extracted_text}"
-            )
-            
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
+                return self._empty_text_result()
             
-            response = self.client.chat.completions.create(
+            messages = self._detection_messages(extracted_text)
+            response = self.rate_limiter.call(
+                self.client.chat.completions.create,
                 model="gpt-4o-mini",
                 messages=messages,
                 temperature=0.1,
-                max_tokens=1000
+                max_tokens=1000,
+                tokens=estimate_tokens(*(m["content"] for m in messages), max_tokens=1000)
             )
             
             raw_content = response.choices[0].message.content
             logger.info(f"Raw OpenAI response: {raw_content}")
             
             # Extract JSON from response
-            json_match = re.search(r'\{.*\}', raw_content, re.DOTALL)
-            if json_match:
-                json_text = json_match.group()
-                try:
-                    result = json.loads(json_text)
-                except json.JSONDecodeError as e:
-                    logger.error(f"JSON decode error: {e}")
-                    result = self._create_fallback_result(extracted_text)
-            else:
-                logger.warning("No JSON found in OpenAI response")
-                result = self._create_fallback_result(extracted_text)
+            result = self._parse_detection_response(raw_content, extracted_text)
             
             # Validate and clean result
             result = self._validate_scam_result(result)
@@ -176,15 +309,181 @@ class ScamDetector:
             logger.error(f"Scam detection failed: {str(e)}")
             return self._create_fallback_result(extracted_text, str(e))
 
+    def detect_scam_text_stream(self, extracted_text: str) -> Iterator[Dict]:
+        """
+        Streaming variant of detect_scam_text.
+        
+        Yields a snapshot of the fields parsed so far each time a top-level
+        field of the JSON response completes, so ``risk_level`` and
+        ``confidence`` are available before ``analysis`` has been generated.
+        Partial snapshots are not validated.
+        
+        Args:
+            extracted_text: Text to analyze for scam indicators
+            
+        Yields:
+            Partial result dictionaries; the last one is the validated result
+        """
+        try:
+            if not extracted_text.strip():
+                yield self._empty_text_result()
+                return
+            
+            messages = self._detection_messages(extracted_text)
+            stream = self.rate_limiter.stream(
+                lambda: self.client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    temperature=0.1,
+                    max_tokens=1000,
+                    stream=True
+                ),
+                tokens=estimate_tokens(*(m["content"] for m in messages), max_tokens=1000)
+            )
+            
+            parser = IncrementalJSONParser()
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta and parser.feed(delta):
+                    yield dict(parser.fields)
+            
+            logger.info(f"Raw OpenAI response: {parser.buffer}")
+            
+            if parser.complete:
+                result = dict(parser.fields)
+            else:
+                result = self._parse_detection_response(parser.buffer, extracted_text)
+            
+            result = self._validate_scam_result(result)
+            
+            logger.info(f"Detected {len(result.get('scam_phrases', []))} scam phrases")
+            yield result
+            
+        except Exception as e:
+            logger.error(f"Scam detection failed: {str(e)}")
+            yield self._create_fallback_result(extracted_text, str(e))
+
+    def analyze_image(self, image_bytes: bytes) -> Tuple[str, Dict]:
+        """
+        Extract text from an image and analyze it for scam indicators.
+        
+        In combined mode a single structured-output vision call returns both;
+        if that call fails or its output does not validate, the two-call
+        OCR + detection path is used instead.
+        
+        Args:
+            image_bytes: Raw image bytes
+            
+        Returns:
+            Tuple of (extracted text, scam analysis dictionary)
+        """
+        if self.combined_mode:
+            try:
+                return self._combined_analysis(image_bytes)
+            except Exception as e:
+                logger.warning(f"Combined analysis failed, falling back to two calls: {str(e)}")
+        
+        extracted_text = self.ocr_with_openai(image_bytes)
+        return extracted_text, self.detect_scam_text(extracted_text)
+
+    def _combined_analysis(self, image_bytes: bytes) -> Tuple[str, Dict]:
+        """
+        Run OCR and scam classification in one structured-output vision call.
+        
+        Raises:
+            ValueError: If the image is empty or the response fails validation
+        """
+        if not image_bytes:
+            raise ValueError("Image bytes cannot be empty")
+        
+        messages = [
+            {
+                "role": "system",
+                "content": (
+                    "You are a precise OCR assistant and a cybersecurity expert specializing in scam detection. "
+                    "First extract ALL visible text from the image exactly as it appears, maintaining "
+                    "formatting and structure, including URLs, phone numbers, and all text elements. "
+                    "Then analyze that text for common scam indicators including: urgency tactics, "
+                    "suspicious URLs, fake offers, phishing attempts, social engineering, "
+                    "grammar/spelling errors typical of scams, requests for personal info, "
+                    "cryptocurrency schemes, and fake authority claims. "
+                    "If scam_type is not applicable, set it to 'Unknown'."
+                )
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": (
+                            "Extract all text from this image into 'extracted_text', then analyze it and fill in:\n"
+                            "- 'risk_level': 'Low', 'Medium', or 'High'\n"
+                            "- 'confidence': confidence score (0-100)\n"
+                            "- 'scam_type': scam type detected\n"
+                            "- 'category': which sector this scam is targeting\n"
+                            "- 'scam_phrases': array of specific suspicious phrases found\n"
+                            "- 'analysis': brief explanation of findings"
+                        )
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": self._image_data_uri(image_bytes), "detail": "high"}
+                    }
+                ]
+            }
+        ]
+        
+        response = self.rate_limiter.call(
+            self.client.chat.completions.create,
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0,
+            max_tokens=3000,
+            response_format={"type": "json_schema", "json_schema": COMBINED_ANALYSIS_SCHEMA},
+            tokens=IMAGE_TOKEN_ESTIMATE + 3000
+        )
+        
+        message = response.choices[0].message
+        if getattr(message, "refusal", None):
+            raise ValueError(f"Model refused: {message.refusal}")
+        
+        result = json.loads(message.content)
+        self._check_combined_result(result)
+        
+        extracted_text = result.pop("extracted_text").strip()
+        if not extracted_text:
+            return "", self._empty_text_result()
+        
+        logger.info(f"Combined analysis extracted {len(extracted_text)} characters of text")
+        return extracted_text, self._validate_scam_result(result)
+
+    def _check_combined_result(self, result: Dict):
+        """Raise ValueError unless ``result`` matches the combined analysis schema."""
+        schema = COMBINED_ANALYSIS_SCHEMA["schema"]
+        expected_types = {"string": str, "integer": int, "array": list}
+        
+        if not isinstance(result, dict):
+            raise ValueError("Combined analysis is not a JSON object")
+        for key in schema["required"]:
+            if key not in result:
+                raise ValueError(f"Combined analysis is missing '{key}'")
+            if not isinstance(result[key], expected_types[schema["properties"][key]["type"]]):
+                raise ValueError(f"Combined analysis field '{key}' has the wrong type")
+        if result["risk_level"] not in schema["properties"]["risk_level"]["enum"]:
+            raise ValueError(f"Invalid risk_level '{result['risk_level']}'")
+
     def _create_fallback_result(self, text: str, error: str = "") -> Dict:
-        """Create fallback result when API calls fail."""
+        """Create fallback result when API calls fail; ``is_fallback`` survives validation."""
         return {
             "scam_phrases": [],
             "risk_level": "Unknown",
             "confidence": 0,
             "analysis": f"Analysis failed{': ' + error if error else ''}",
             "scam_type": "Unknown",
-            "category": "Unknown"
+            "category": "Unknown",
+            "is_fallback": True
         }
 
     def _validate_scam_result(self, result: Dict) -> Dict:
@@ -225,4 +524,16 @@ def ocr_with_openai(image_bytes: bytes) -> str:
 def detect_scam_text(extracted_text: str) -> Dict:
     """Detect scam phrases in text using OpenAI."""
     detector = ScamDetector()
-    return detector.detect_scam_text(extracted_text)
\ No newline at end of file
+    return detector.detect_scam_text(extracted_text)
+
+
+def analyze_image(image_bytes: bytes) -> Tuple[str, Dict]:
+    """Extract text and detect scams, in one call when combined mode is enabled."""
+    detector = ScamDetector()
+    return detector.analyze_image(image_bytes)
+
+
+def detect_scam_text_stream(extracted_text: str) -> Iterator[Dict]:
+    """Stream partial scam detection results; the last one is validated."""
+    detector = ScamDetector()
+    return detector.detect_scam_text_stream(extracted_text)
\ No newline at end of file
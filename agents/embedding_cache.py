@@ -0,0 +1,225 @@
+"""
+Persistent cache for text embeddings.
+
+``CachedEmbeddings`` wraps a LangChain embeddings client so identical texts
+are embedded once, whether they are being stored or queried. Entries are
+keyed by the SHA-256 of the model name and the normalized text and hold the
+vector as packed float16 or float32, in a local SQLite file or in Redis,
+with least-recently-used eviction beyond a size bound.
+"""
+
+import os
+import time
+import struct
+import hashlib
+import logging
+import sqlite3
+import threading
+import unicodedata
+from typing import Dict, List
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "embedding_cache:"
+CACHE_INDEX_KEY = "embedding_cache_index"
+DEFAULT_MAX_ENTRIES = 20000
+# Outside the working tree, so the database and its WAL files never end up in the repo
+DEFAULT_PATH = os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "truthloop", "embedding_cache.sqlite3",
+)
+
+# First byte of a stored vector: its element format
+DTYPE_CODES = {"float16": (b"\x02", "e"), "float32": (b"\x04", "f")}
+FORMATS_BY_CODE = {code: fmt for code, fmt in DTYPE_CODES.values()}
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace, so trivially different copies share an entry."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def cache_key(model: str, text: str) -> str:
+    """Cache key of ``text`` embedded with ``model``."""
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def pack_vector(vector: List[float], dtype: str = "float16") -> bytes:
+    """Pack a vector into the compact stored format."""
+    code, fmt = DTYPE_CODES[dtype]
+    return code + struct.pack(f"<{len(vector)}{fmt}", *vector)
+
+
+def unpack_vector(data: bytes) -> List[float]:
+    """Inverse of ``pack_vector``, for either element format."""
+    fmt = FORMATS_BY_CODE[data[:1]]
+    count = (len(data) - 1) // struct.calcsize(fmt)
+    return list(struct.unpack(f"<{count}{fmt}", data[1:]))
+
+
+class SQLiteEmbeddingStore:
+    """Embedding store in a local SQLite file."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB, accessed REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)")
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        """Fetch stored vectors and refresh their recency."""
+        with self._lock:
+            placeholders = ",".join("?" * len(keys))
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys
+            ).fetchall()
+            if rows:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET accessed = ? WHERE key = ?",
+                                       [(now, key) for key, _ in rows])
+                self._conn.commit()
+        return dict(rows)
+
+    def put_many(self, entries: Dict[str, bytes]):
+        """Store vectors and evict least recently used entries beyond ``max_entries``."""
+        with self._lock:
+            now = time.time()
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                                   [(key, vector, now) for key, vector in entries.items()])
+            overflow = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY accessed LIMIT ?)", (overflow,)
+                )
+                logger.info(f"Evicted {overflow} cached embeddings")
+            self._conn.commit()
+
+
+class RedisEmbeddingStore:
+    """Embedding store in Redis, shared by every process."""
+
+    def __init__(self, redis_client, max_entries: int):
+        """
+        Args:
+            redis_client: Redis client created with ``decode_responses=False``
+            max_entries: Upper bound on cached vectors
+        """
+        self.redis = redis_client
+        self.max_entries = max_entries
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        """Fetch stored vectors and refresh their recency."""
+        vectors = self.redis.mget([f"{CACHE_KEY_PREFIX}{key}" for key in keys])
+        found = {key: vector for key, vector in zip(keys, vectors) if vector is not None}
+        if found:
+            now = time.time()
+            self.redis.zadd(CACHE_INDEX_KEY, {key: now for key in found}, xx=True)
+        return found
+
+    def put_many(self, entries: Dict[str, bytes]):
+        """Store vectors and evict least recently used entries beyond ``max_entries``."""
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.mset({f"{CACHE_KEY_PREFIX}{key}": vector for key, vector in entries.items()})
+        pipe.zadd(CACHE_INDEX_KEY, {key: now for key in entries})
+        pipe.zcard(CACHE_INDEX_KEY)
+        overflow = pipe.execute()[-1] - self.max_entries
+        if overflow > 0:
+            evicted = self.redis.zpopmin(CACHE_INDEX_KEY, overflow)
+            if evicted:
+                self.redis.delete(*[f"{CACHE_KEY_PREFIX}{key.decode('utf-8')}" for key, _ in evicted])
+                logger.info(f"Evicted {len(evicted)} cached embeddings")
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings client that serves repeated texts from a persistent store."""
+
+    def __init__(self, embeddings: Embeddings, model: str, store, dtype: str = "float16"):
+        """
+        Initialize the wrapper.
+
+        Args:
+            embeddings: Underlying LangChain embeddings client
+            model: Model name, part of every cache key
+            store: ``SQLiteEmbeddingStore`` or ``RedisEmbeddingStore``
+            dtype: Stored element format, "float16" or "float32"
+        """
+        self.embeddings = embeddings
+        self.model = model
+        self.store = store
+        self.dtype = dtype
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, calling the API only for those not cached."""
+        keys = [cache_key(self.model, text) for text in texts]
+        try:
+            cached = self.store.get_many(list(set(keys)))
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {str(e)}")
+            cached = {}
+        vectors = {key: unpack_vector(data) for key, data in cached.items()}
+
+        # Embed each uncached text once, even if it repeats within the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            fresh = self.embeddings.embed_documents(list(missing.values()))
+            vectors.update(zip(missing, fresh))
+            try:
+                self.store.put_many({key: pack_vector(vectors[key], self.dtype) for key in missing})
+            except Exception as e:
+                logger.warning(f"Embedding cache store failed: {str(e)}")
+
+        logger.debug(f"Embedding cache: {len(texts) - len(missing)} of {len(texts)} texts cached")
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query through the same cache as documents."""
+        return self.embed_documents([text])[0]
+
+
+def get_embedding_store():
+    """
+    Build the embedding store selected by ``EMBEDDING_CACHE``.
+
+    ``disk`` (default) uses the SQLite file at ``EMBEDDING_CACHE_PATH``,
+    ``redis`` the shared Redis instance and ``off`` disables caching. The size
+    bound is ``EMBEDDING_CACHE_MAX_ENTRIES``.
+
+    Returns:
+        The store, or None when caching is off or the backend is unavailable
+    """
+    backend = os.getenv("EMBEDDING_CACHE", "disk").lower()
+    max_entries = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+    try:
+        if backend == "redis":
+            from agents.clients import get_redis_client
+
+            return RedisEmbeddingStore(get_redis_client(decode_responses=False), max_entries)
+        if backend == "disk":
+            return SQLiteEmbeddingStore(os.path.expanduser(os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_PATH)), max_entries)
+    except Exception as e:
+        logger.warning(f"Embedding cache unavailable, embedding without it: {str(e)}")
+    return None
+
+
+def cached_embeddings(embeddings: Embeddings, model: str) -> Embeddings:
+    """Wrap ``embeddings`` in the configured cache (``EMBEDDING_CACHE_DTYPE`` float16/float32)."""
+    store = get_embedding_store()
+    if store is None:
+        return embeddings
+    dtype = os.getenv("EMBEDDING_CACHE_DTYPE", "float16").lower()
+    if dtype not in DTYPE_CODES:
+        logger.warning(f"Unknown EMBEDDING_CACHE_DTYPE {dtype!r}, using float16")
+        dtype = "float16"
+    return CachedEmbeddings(embeddings, model, store, dtype)
@@ -0,0 +1,709 @@
+"""
+Redis storage for the analysis history shown on the Feed page.
+
+Each saved analysis is a ``history:{id}`` hash of small metadata fields plus
+raw ``history_blob:{id}`` (uploaded image) and ``history_thumb:{id}``
+(precomputed thumbnail) values, all expiring after 30 days, indexed by save
+time in the ``history_index`` sorted set.
+
+Image bytes are read and written through a second, binary-safe Redis
+connection so they are stored without base64 inflation. Older records keep
+a base64 image in the hash's ``image_data`` field until ``migrate_images``
+rewrites them.
+
+The ``analysis`` field uses the versioned binary format of
+``agents.record_format``; plain JSON written by older versions is still read
+and is converted by ``migrate_records``.
+
+Feed statistics are kept as running totals in ``history_stats`` and each
+record is also added to a ``history_index:{field}:{value}`` sorted set per
+``FACET_FIELDS`` value, so the feed can be filtered server-side. Both are
+maintained by the Lua scripts that add records to and remove them from the
+index; ``history_stats_contrib`` remembers what each indexed record added so
+it can be subtracted again when the record expires.
+
+The same scripts maintain an inverted index for search: every term of a
+record's OCR text and scam phrases gets a ``history_index:term:{term}``
+sorted set of the records containing it, scored by term weight.
+"""
+
+import io
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from agents.record_format import encode_analysis, decode_analysis, is_legacy
+from agents.text_index import tokenize, term_weights, idf
+
+logger = logging.getLogger(__name__)
+
+HISTORY_KEY_PREFIX = "history:"
+HISTORY_BLOB_KEY_PREFIX = "history_blob:"
+HISTORY_THUMB_KEY_PREFIX = "history_thumb:"
+HISTORY_INDEX_KEY = "history_index"
+HISTORY_STATS_KEY = "history_stats"
+HISTORY_CONTRIB_KEY = "history_stats_contrib"
+# Base64 image field of the hash in records saved before images were stored raw
+LEGACY_IMAGE_FIELD = 'image_data'
+# Fields fetched for the grid and statistics; never includes image data
+METADATA_FIELDS = ('id', 'timestamp', 'analysis', 'risk_level', 'threat_count')
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60  # 30 days
+
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_QUALITY = 70
+
+# Shared helpers of the index scripts. KEYS: index, stats, contributions.
+# A contribution is the JSON written by ``index_contribution``.
+# Facet indexes live at <index>:<field>:<value>, value counts at
+# <index>:values:<field> and search terms at <index>:term:<term>.
+INDEX_LUA = """
+local function apply(id, score, contribution)
+    local c = cjson.decode(contribution)
+    redis.call('HINCRBY', KEYS[2], 'high_risk', c.high_risk)
+    redis.call('HINCRBYFLOAT', KEYS[2], 'confidence_sum', c.confidence)
+    for field, value in pairs(c.facets) do
+        redis.call('ZADD', KEYS[1] .. ':' .. field .. ':' .. value, score, id)
+        redis.call('HINCRBY', KEYS[1] .. ':values:' .. field, value, 1)
+    end
+    for term, weight in pairs(c.terms) do
+        redis.call('ZADD', KEYS[1] .. ':term:' .. term, weight, id)
+    end
+    redis.call('HSET', KEYS[3], id, contribution)
+end
+
+local function unapply(id, contribution)
+    local c = cjson.decode(contribution)
+    redis.call('HINCRBY', KEYS[2], 'high_risk', -c.high_risk)
+    redis.call('HINCRBYFLOAT', KEYS[2], 'confidence_sum', -c.confidence)
+    for field, value in pairs(c.facets) do
+        redis.call('ZREM', KEYS[1] .. ':' .. field .. ':' .. value, id)
+        if redis.call('HINCRBY', KEYS[1] .. ':values:' .. field, value, -1) <= 0 then
+            redis.call('HDEL', KEYS[1] .. ':values:' .. field, value)
+        end
+    end
+    for term in pairs(c.terms) do
+        redis.call('ZREM', KEYS[1] .. ':term:' .. term, id)
+    end
+    redis.call('HDEL', KEYS[3], id)
+end
+
+local function remove(id)
+    if redis.call('ZREM', KEYS[1], id) == 0 then
+        return 0
+    end
+    local contribution = redis.call('HGET', KEYS[3], id)
+    if contribution then
+        unapply(id, contribution)
+    end
+    return 1
+end
+"""
+
+# ARGV: id, score, contribution
+INDEX_ADD_SCRIPT = INDEX_LUA + """
+if redis.call('ZADD', KEYS[1], 'NX', ARGV[2], ARGV[1]) == 0 then
+    return 0
+end
+apply(ARGV[1], ARGV[2], ARGV[3])
+return 1
+"""
+
+# ARGV: oldest score to keep
+INDEX_PRUNE_SCRIPT = INDEX_LUA + """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, id in ipairs(expired) do
+    remove(id)
+end
+return #expired
+"""
+
+# ARGV: ids to remove
+INDEX_REMOVE_SCRIPT = INDEX_LUA + """
+local removed = 0
+for _, id in ipairs(ARGV) do
+    removed = removed + remove(id)
+end
+return removed
+"""
+
+# Applies the contribution of a record indexed before the statistics, facet
+# and search indexes existed. ARGV: id, contribution
+INDEX_BACKFILL_SCRIPT = INDEX_LUA + """
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not score or redis.call('HEXISTS', KEYS[3], ARGV[1]) == 1 then
+    return 0
+end
+apply(ARGV[1], score, ARGV[2])
+return 1
+"""
+INDEX_KEYS = [HISTORY_INDEX_KEY, HISTORY_STATS_KEY, HISTORY_CONTRIB_KEY]
+
+# Analysis fields with a secondary index each, for filtering the feed
+FACET_FIELDS = ('risk_level', 'scam_type', 'category')
+# Seconds an intersection of several facet indexes is kept
+FACET_QUERY_TTL = 30
+# Seconds a ranked search result set is kept, so paging does not recompute it
+SEARCH_QUERY_TTL = 60
+
+# Replace a field only if it still holds the expected value, so online
+# migrations never resurrect an expired record or overwrite a newer write
+HSET_IF_UNCHANGED_SCRIPT = """
+if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+    return redis.call('HSET', KEYS[1], ARGV[1], ARGV[3])
+end
+return -1
+"""
+
+
+def make_thumbnail(image_bytes: bytes) -> bytes:
+    """
+    Build a small WebP thumbnail (JPEG if WebP is unavailable).
+
+    Args:
+        image_bytes: Full uploaded image
+
+    Returns:
+        Encoded thumbnail bytes
+    """
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes)))
+    image.thumbnail(THUMBNAIL_SIZE)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+
+    buffer = io.BytesIO()
+    try:
+        image.save(buffer, format="WEBP", quality=THUMBNAIL_QUALITY)
+    except (KeyError, OSError):
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=THUMBNAIL_QUALITY)
+    return buffer.getvalue()
+
+
+def facet_values(analysis: Dict) -> Dict[str, str]:
+    """Values of the indexed fields of an analysis, with whitespace collapsed."""
+    values = {}
+    for field in FACET_FIELDS:
+        value = " ".join(str(analysis.get(field) or "").split())
+        if value:
+            values[field] = value
+    return values
+
+
+def facet_index_key(field: str, value: str) -> str:
+    """Sorted set of the ids whose ``field`` equals ``value``, scored by save time."""
+    return f"{HISTORY_INDEX_KEY}:{field}:{value}"
+
+
+def term_index_key(term: str) -> str:
+    """Sorted set of the ids containing ``term``, scored by term weight."""
+    return f"{HISTORY_INDEX_KEY}:term:{term}"
+
+
+def index_contribution(analysis: Dict, extracted_text: str = "") -> str:
+    """What one analysis adds to the statistics, facet and search indexes, as stored JSON."""
+    try:
+        confidence = float(analysis.get('confidence', analysis.get('confidence_score', 0)) or 0)
+    except (TypeError, ValueError):
+        confidence = 0.0
+    return json.dumps({
+        'high_risk': 1 if analysis.get('risk_level') == 'High' else 0,
+        'confidence': confidence,
+        'facets': facet_values(analysis),
+        'terms': term_weights(extracted_text, analysis.get('scam_phrases', [])),
+    })
+
+
+class HistoryStore:
+    """Saves, pages through and prunes stored analyses."""
+
+    def __init__(self, redis_client, blob_client, ttl_seconds: Optional[int] = None):
+        """
+        Initialize the store.
+
+        Args:
+            redis_client: Redis client created with ``decode_responses=True``
+            blob_client: Redis client for the same server created with
+                ``decode_responses=False``, used for raw image bytes
+            ttl_seconds: Lifetime of each record (env ``HISTORY_TTL``)
+        """
+        self.redis = redis_client
+        self.blob = blob_client
+        self.ttl_seconds = ttl_seconds or int(os.getenv("HISTORY_TTL", DEFAULT_TTL_SECONDS))
+        self._hset_if_unchanged = blob_client.register_script(HSET_IF_UNCHANGED_SCRIPT)
+        self._index_add = redis_client.register_script(INDEX_ADD_SCRIPT)
+        self._index_prune = redis_client.register_script(INDEX_PRUNE_SCRIPT)
+        self._index_remove = redis_client.register_script(INDEX_REMOVE_SCRIPT)
+        self._index_backfill = redis_client.register_script(INDEX_BACKFILL_SCRIPT)
+
+    def save(self, analysis_data: Dict, image_data: bytes, extracted_text: str = "") -> str:
+        """
+        Save an analysis atomically.
+
+        The metadata record, the image and thumbnail blobs, their expiry, the
+        index entries and the running statistics are written in one MULTI/EXEC
+        transaction on the binary-safe connection, which also sweeps index
+        entries whose records have expired.
+
+        Args:
+            analysis_data: Scam detection result
+            image_data: Uploaded image bytes
+            extracted_text: OCR text of the image, stored and indexed for search
+
+        Returns:
+            The new analysis id
+        """
+        # Create unique ID based on timestamp and content hash
+        now = datetime.now()
+        timestamp = now.isoformat()
+        content_hash = hashlib.md5(json.dumps(analysis_data, sort_keys=True).encode()).hexdigest()[:8]
+        analysis_id = f"analysis_{timestamp}_{content_hash}"
+        key = f"{HISTORY_KEY_PREFIX}{analysis_id}"
+
+        # Prepare data for storage
+        storage_data = {
+            'id': analysis_id,
+            'timestamp': timestamp,
+            'analysis': encode_analysis(analysis_data),
+            'risk_level': analysis_data.get('risk_level', 'Unknown'),
+            'threat_count': len(analysis_data.get('scam_phrases', [])),
+            'extracted_text': extracted_text or ''
+        }
+
+        # Thumbnail is built once here so the grid never touches the full image
+        try:
+            thumbnail = make_thumbnail(image_data)
+        except Exception as e:
+            logger.warning(f"Thumbnail generation failed for {analysis_id}: {str(e)}")
+            thumbnail = None
+
+        pipe = self.blob.pipeline(transaction=True)
+        pipe.hset(key, mapping=storage_data)
+        pipe.expire(key, self.ttl_seconds)
+        pipe.set(f"{HISTORY_BLOB_KEY_PREFIX}{analysis_id}", image_data, ex=self.ttl_seconds)
+        if thumbnail:
+            pipe.set(f"{HISTORY_THUMB_KEY_PREFIX}{analysis_id}", thumbnail, ex=self.ttl_seconds)
+        contribution = index_contribution(analysis_data, extracted_text)
+        self._index_add(keys=INDEX_KEYS, args=[analysis_id, now.timestamp(), contribution], client=pipe)
+        self._index_prune(keys=INDEX_KEYS, args=[now.timestamp() - self.ttl_seconds], client=pipe)
+        pruned = pipe.execute()[-1]
+
+        if pruned:
+            logger.info(f"Pruned {pruned} expired history index entries")
+        return analysis_id
+
+    def prune_expired(self) -> int:
+        """Remove index entries whose records are past their TTL."""
+        return self._index_prune(keys=INDEX_KEYS, args=[time.time() - self.ttl_seconds])
+
+    def get_stats(self) -> Dict:
+        """
+        Read the feed statistics in O(1), after sweeping expired entries.
+
+        Returns:
+            Dictionary with ``total``, ``high_risk`` and ``avg_confidence``
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        self._index_prune(keys=INDEX_KEYS, args=[time.time() - self.ttl_seconds], client=pipe)
+        pipe.zcard(HISTORY_INDEX_KEY)
+        pipe.hmget(HISTORY_STATS_KEY, ['high_risk', 'confidence_sum'])
+        _, total, (high_risk, confidence_sum) = pipe.execute()
+
+        return {
+            'total': total,
+            'high_risk': int(high_risk or 0),
+            'avg_confidence': float(confidence_sum or 0) / total if total else 0.0,
+        }
+
+    def get_facet_values(self, field: str) -> List[Tuple[str, int]]:
+        """
+        List the indexed values of a facet field, most common first.
+
+        Args:
+            field: One of ``FACET_FIELDS``
+
+        Returns:
+            List of (value, record count)
+        """
+        counts = self.redis.hgetall(f"{HISTORY_INDEX_KEY}:values:{field}")
+        return sorted(((value, int(count)) for value, count in counts.items()), key=lambda item: (-item[1], item[0]))
+
+    def _filtered_index(self, filters: Optional[Dict[str, str]]) -> str:
+        """
+        Sorted set holding the ids that match every filter.
+
+        A single filter uses its facet index directly; several are intersected
+        server-side into a short-lived key, keeping save time as the score,
+        which later pages and reruns reuse until it expires.
+        """
+        facet_keys = sorted(facet_index_key(field, value) for field, value in (filters or {}).items() if value)
+        if not facet_keys:
+            return HISTORY_INDEX_KEY
+        if len(facet_keys) == 1:
+            return facet_keys[0]
+
+        query_key = f"{HISTORY_INDEX_KEY}:query:{hashlib.md5('|'.join(facet_keys).encode()).hexdigest()}"
+        if not self.redis.exists(query_key):
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.zinterstore(query_key, facet_keys, aggregate='MAX')
+            pipe.expire(query_key, FACET_QUERY_TTL)
+            pipe.execute()
+        return query_key
+
+    def load_page(self, page: int = 0, page_size: int = 12,
+                  filters: Optional[Dict[str, str]] = None) -> Tuple[List[Dict], int]:
+        """
+        Load one page of history, newest first.
+
+        Index entries whose records have disappeared are removed lazily.
+
+        Args:
+            page: Zero-based page number
+            page_size: Records per page
+            filters: Facet field -> required value (see ``FACET_FIELDS``)
+
+        Returns:
+            Tuple of (history items, total number of matching records)
+        """
+        return self._load_index_page(self._filtered_index(filters), page, page_size)
+
+    def search(self, query: str, page: int = 0, page_size: int = 12,
+               filters: Optional[Dict[str, str]] = None) -> Tuple[List[Dict], int]:
+        """
+        Find records whose OCR text or scam phrases contain every query term.
+
+        Matches are ranked by the sum of their term weights times each term's
+        inverse document frequency, newest first among equal scores. The
+        intersection runs server-side and is kept for ``SEARCH_QUERY_TTL``
+        seconds so further pages only read a range of it.
+
+        Args:
+            query: Free-text query
+            page: Zero-based page number
+            page_size: Records per page
+            filters: Facet field -> required value (see ``FACET_FIELDS``)
+
+        Returns:
+            Tuple of (history items, total number of matching records)
+        """
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return [], 0
+        facet_keys = sorted(facet_index_key(field, value) for field, value in (filters or {}).items() if value)
+
+        query_key = f"{HISTORY_INDEX_KEY}:search:{hashlib.md5('|'.join(terms + facet_keys).encode()).hexdigest()}"
+        if not self.redis.exists(query_key):
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zcard(HISTORY_INDEX_KEY)
+            for term in terms:
+                pipe.zcard(term_index_key(term))
+            total, *document_counts = pipe.execute()
+            if not all(document_counts):
+                return [], 0
+
+            # Facet indexes only restrict the matches; their scores are ignored
+            weights = {term_index_key(term): idf(total, count) for term, count in zip(terms, document_counts)}
+            weights.update({facet_key: 0 for facet_key in facet_keys})
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.zinterstore(query_key, weights, aggregate='SUM')
+            pipe.expire(query_key, SEARCH_QUERY_TTL)
+            pipe.execute()
+
+        return self._load_index_page(query_key, page, page_size)
+
+    def _load_index_page(self, index_key: str, page: int, page_size: int) -> Tuple[List[Dict], int]:
+        """Load one page of the records in ``index_key``, highest score first."""
+        # Page of history IDs plus the total, in one round trip
+        start = page * page_size
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zcard(index_key)
+        pipe.zrevrange(index_key, start, start + page_size - 1)
+        total, history_ids = pipe.execute()
+
+        if not history_ids:
+            return [], total
+
+        history_items, dead_ids = self._fetch_items(history_ids)
+        if dead_ids and index_key != HISTORY_INDEX_KEY:
+            # Cached query results are not covered by the index scripts
+            self.redis.zrem(index_key, *dead_ids)
+        return history_items, total - len(dead_ids)
+
+    def get_items(self, history_ids: List[str]) -> List[Dict]:
+        """
+        Load specific records, in the given order, skipping expired ones.
+
+        Args:
+            history_ids: Record ids
+
+        Returns:
+            History items in the shape returned by ``load_page``
+        """
+        if not history_ids:
+            return []
+        return self._fetch_items(history_ids)[0]
+
+    def _fetch_items(self, history_ids: List[str]) -> Tuple[List[Dict], List[str]]:
+        """
+        Fetch and parse records, removing those that have disappeared from the indexes.
+
+        Returns:
+            Tuple of (history items, ids of records that no longer exist)
+        """
+        # Fetch the metadata and raw thumbnail of every record in one
+        # pipelined round trip on the binary-safe connection
+        pipe = self.blob.pipeline(transaction=False)
+        for history_id in history_ids:
+            pipe.hmget(f"{HISTORY_KEY_PREFIX}{history_id}", METADATA_FIELDS)
+        pipe.mget([f"{HISTORY_THUMB_KEY_PREFIX}{history_id}" for history_id in history_ids])
+        *records, thumbnails = pipe.execute()
+
+        history_items = []
+        dead_ids = []
+        for history_id, values, thumbnail in zip(history_ids, records, thumbnails):
+            data = {field: value for field, value in zip(METADATA_FIELDS, values) if value is not None}
+            if not data:
+                dead_ids.append(history_id)
+                continue
+
+            # Parse the stored analysis (binary record or legacy JSON)
+            try:
+                analysis = decode_analysis(data.pop('analysis', b'{}'))
+            except ValueError as e:
+                logger.warning(f"Skipping unreadable history record {history_id}: {str(e)}")
+                continue
+            data = {field: value.decode('utf-8') for field, value in data.items()}
+            data['analysis'] = analysis
+            data['thumbnail'] = thumbnail
+
+            # Ensure required fields exist with defaults
+            data.setdefault('id', history_id)
+            data.setdefault('risk_level', analysis.get('risk_level', 'Unknown'))
+            data.setdefault('threat_count', len(analysis.get('scam_phrases', [])))
+            data.setdefault('timestamp', datetime.now().isoformat())
+
+            history_items.append(data)
+
+        if dead_ids:
+            self._index_remove(keys=INDEX_KEYS, args=dead_ids)
+            logger.info(f"Removed {len(dead_ids)} expired entries from the history index")
+
+        return history_items, dead_ids
+
+    def get_extracted_text(self, analysis_id: str) -> str:
+        """OCR text stored with a record (empty for records saved before it was kept)."""
+        return self.redis.hget(f"{HISTORY_KEY_PREFIX}{analysis_id}", 'extracted_text') or ''
+
+    def get_image(self, analysis_id: str) -> Optional[bytes]:
+        """
+        Fetch the full uploaded image of one record.
+
+        Args:
+            analysis_id: Record id
+
+        Returns:
+            Image bytes, or None if the record has expired
+        """
+        image_data = self.blob.get(f"{HISTORY_BLOB_KEY_PREFIX}{analysis_id}")
+        if image_data is not None:
+            return image_data
+        # Records not yet migrated keep a base64 image in the hash
+        image_b64 = self.blob.hget(f"{HISTORY_KEY_PREFIX}{analysis_id}", LEGACY_IMAGE_FIELD)
+        return base64.b64decode(image_b64) if image_b64 else None
+
+    def backfill_thumbnails(self, batch_size: int = 100) -> int:
+        """
+        Build thumbnails for indexed records saved before thumbnails existed.
+
+        Args:
+            batch_size: Records checked per pipelined round trip
+
+        Returns:
+            Number of thumbnails written
+        """
+        written = 0
+        batch = []
+        for history_id, _ in self.redis.zscan_iter(HISTORY_INDEX_KEY, count=batch_size):
+            batch.append(history_id)
+            if len(batch) >= batch_size:
+                written += self._backfill_thumbnail_batch(batch)
+                batch = []
+        if batch:
+            written += self._backfill_thumbnail_batch(batch)
+        return written
+
+    def _backfill_thumbnail_batch(self, history_ids: List[str]) -> int:
+        """Write missing thumbnails for one batch of records."""
+        pipe = self.blob.pipeline(transaction=False)
+        for history_id in history_ids:
+            pipe.exists(f"{HISTORY_THUMB_KEY_PREFIX}{history_id}")
+            pipe.pttl(f"{HISTORY_KEY_PREFIX}{history_id}")
+        results = pipe.execute()
+
+        written = 0
+        for i, history_id in enumerate(history_ids):
+            has_thumbnail, ttl_ms = results[2 * i:2 * i + 2]
+            # A negative TTL means the record is gone (or was never given one)
+            if has_thumbnail or ttl_ms <= 0:
+                continue
+            try:
+                image_data = self.get_image(history_id)
+                if not image_data:
+                    continue
+                # Expires together with the record it belongs to
+                self.blob.set(f"{HISTORY_THUMB_KEY_PREFIX}{history_id}", make_thumbnail(image_data), px=ttl_ms)
+                written += 1
+            except Exception as e:
+                logger.warning(f"Thumbnail backfill failed for {history_id}: {str(e)}")
+        return written
+
+    def migrate_images(self, batch_size: int = 100) -> int:
+        """
+        Rewrite base64 images of older records as raw blobs.
+
+        Walks ``history:*`` with SCAN, so it can run while the app is serving.
+        Each record is converted in its own transaction and its blobs keep the
+        record's remaining TTL.
+
+        Args:
+            batch_size: Records read per pipelined round trip
+
+        Returns:
+            Number of records migrated
+        """
+        migrated = 0
+        batch = []
+        for key in self.blob.scan_iter(match=f"{HISTORY_KEY_PREFIX}*", count=batch_size):
+            batch.append(key.decode('utf-8')[len(HISTORY_KEY_PREFIX):])
+            if len(batch) >= batch_size:
+                migrated += self._migrate_image_batch(batch)
+                batch = []
+        if batch:
+            migrated += self._migrate_image_batch(batch)
+        return migrated
+
+    def _migrate_image_batch(self, history_ids: List[str]) -> int:
+        """Migrate the base64 images of one batch of records."""
+        pipe = self.blob.pipeline(transaction=False)
+        for history_id in history_ids:
+            pipe.hget(f"{HISTORY_KEY_PREFIX}{history_id}", LEGACY_IMAGE_FIELD)
+            pipe.pttl(f"{HISTORY_KEY_PREFIX}{history_id}")
+        results = pipe.execute()
+
+        migrated = 0
+        for i, history_id in enumerate(history_ids):
+            image_b64, ttl_ms = results[2 * i:2 * i + 2]
+            if not image_b64 or ttl_ms == -2:
+                continue
+            # Records that somehow lost their TTL get the default one
+            expiry = {'px': ttl_ms} if ttl_ms > 0 else {'ex': self.ttl_seconds}
+
+            try:
+                pipe = self.blob.pipeline(transaction=True)
+                pipe.set(f"{HISTORY_BLOB_KEY_PREFIX}{history_id}", base64.b64decode(image_b64), **expiry)
+                pipe.hdel(f"{HISTORY_KEY_PREFIX}{history_id}", LEGACY_IMAGE_FIELD)
+                pipe.execute()
+                migrated += 1
+            except Exception as e:
+                logger.warning(f"Image migration failed for {history_id}: {str(e)}")
+        return migrated
+
+    def migrate_records(self, batch_size: int = 100) -> int:
+        """
+        Rewrite legacy JSON ``analysis`` fields in the current record format.
+
+        Walks ``history:*`` with SCAN, so it can run while the app is serving.
+        Each field is replaced only if it is unchanged since it was read.
+
+        Args:
+            batch_size: Records read per pipelined round trip
+
+        Returns:
+            Number of records converted
+        """
+        converted = 0
+        batch = []
+        for key in self.blob.scan_iter(match=f"{HISTORY_KEY_PREFIX}*", count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                converted += self._migrate_record_batch(batch)
+                batch = []
+        if batch:
+            converted += self._migrate_record_batch(batch)
+        return converted
+
+    def _migrate_record_batch(self, keys: List[bytes]) -> int:
+        """Convert the legacy records of one batch of keys."""
+        pipe = self.blob.pipeline(transaction=False)
+        for key in keys:
+            pipe.hget(key, 'analysis')
+        raw_analyses = pipe.execute()
+
+        converted = 0
+        for key, raw in zip(keys, raw_analyses):
+            if raw is None or not is_legacy(raw):
+                continue
+            try:
+                encoded = encode_analysis(decode_analysis(raw))
+                if self._hset_if_unchanged(keys=[key], args=['analysis', raw, encoded]) >= 0:
+                    converted += 1
+            except Exception as e:
+                logger.warning(f"Record migration failed for {key!r}: {str(e)}")
+        return converted
+
+    def backfill_indexes(self, batch_size: int = 100) -> int:
+        """
+        Add indexed records saved before the statistics, facet or search
+        indexes existed.
+
+        Safe to run while the app is serving and to run more than once: each
+        record is applied only if it has no contribution yet.
+
+        Args:
+            batch_size: Records read per pipelined round trip
+
+        Returns:
+            Number of records added to the statistics and facet indexes
+        """
+        added = 0
+        batch = []
+        for history_id, _ in self.redis.zscan_iter(HISTORY_INDEX_KEY, count=batch_size):
+            batch.append(history_id)
+            if len(batch) >= batch_size:
+                added += self._backfill_index_batch(batch)
+                batch = []
+        if batch:
+            added += self._backfill_index_batch(batch)
+        return added
+
+    def _backfill_index_batch(self, history_ids: List[str]) -> int:
+        """Apply the contributions of one batch of records."""
+        pipe = self.redis.pipeline(transaction=False)
+        for history_id in history_ids:
+            pipe.hexists(HISTORY_CONTRIB_KEY, history_id)
+        indexed = pipe.execute()
+
+        missing = [history_id for history_id, has_contribution in zip(history_ids, indexed) if not has_contribution]
+        if not missing:
+            return 0
+        pipe = self.blob.pipeline(transaction=False)
+        for history_id in missing:
+            pipe.hmget(f"{HISTORY_KEY_PREFIX}{history_id}", ['analysis', 'extracted_text'])
+        records = pipe.execute()
+
+        pipe = self.redis.pipeline(transaction=False)
+        for history_id, (raw, extracted_text) in zip(missing, records):
+            try:
+                analysis = decode_analysis(raw) if raw is not None else {}
+            except ValueError:
+                analysis = {}
+            # Records that are already gone still count towards the total
+            # until pruned, so they get an empty contribution
+            contribution = index_contribution(analysis, (extracted_text or b'').decode('utf-8'))
+            self._index_backfill(keys=INDEX_KEYS, args=[history_id, contribution], client=pipe)
+        return sum(pipe.execute())
@@ -1,10 +1,6 @@
 import base64
-from openai import OpenAI
-from dotenv import load_dotenv
-
-
-load_dotenv()  # Load .env automatically
-client = OpenAI()
+from agents.clients import get_openai_client
+from agents.rate_limit import get_rate_limiter
 
 def encode_image_to_base64(image_path: str) -> str:
     with open(image_path, "rb") as f:
@@ -15,8 +11,8 @@ def generate_starter_frame(script_text: str, output_path="starter_frame.png"):
     Generates a single neutral starter frame for an educational video
     using OpenAI's DALL·E 3 model.
     """
-    # Use API key from environment
-    client = OpenAI()
+    # Shared client, API key from environment
+    client = get_openai_client()
 
     prompt = (
         f"Create a neutral, realistic image representing the following educational scenario: '{script_text}'. "
@@ -24,7 +20,8 @@ def generate_starter_frame(script_text: str, output_path="starter_frame.png"):
         "Keep it coherent and factual, suitable as a starter frame for an educational video."
     )
 
-    response = client.images.generate(
+    response = get_rate_limiter("openai_images").call(
+        client.images.generate,
         model="dall-e-3",
         prompt=prompt,
         size="1024x1024",
@@ -0,0 +1,303 @@
+"""
+Redis-backed job queue for home-page analyses.
+
+The Streamlit app submits an uploaded image and polls the job hash for stage
+results while one or more ``worker.py`` processes, possibly on other
+machines, run the analysis pipeline.
+
+Keys:
+    jobs:pending        list of job ids waiting for a worker
+    jobs:processing     list of job ids claimed by a worker
+    jobs:leases         sorted set of job id -> visibility deadline
+    jobs:dead           list of job ids that exhausted their attempts
+    job:{id}            hash with status, attempts, error and stage outputs
+    job:{id}:image      uploaded image (base64)
+    job_dedup:{digest}  id of the live job for an image digest
+"""
+
+import os
+import json
+import time
+import uuid
+import base64
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "jobs:pending"
+PROCESSING_KEY = "jobs:processing"
+LEASES_KEY = "jobs:leases"
+DEAD_LETTER_KEY = "jobs:dead"
+
+# Stage outputs persisted on the job hash, in render order
+RESULT_STAGES = ("extracted_text", "scam_json", "narration", "what_if_scenario", "frame_bytes")
+# Streaming stages whose latest partial output is published while they run
+PARTIAL_STAGES = ("scam_json", "educational_content")
+# Result stages a partial is rendered against, and result stages that supersede it
+PARTIAL_STAGE_INPUTS = {"scam_json": ("extracted_text",), "educational_content": ("scam_json",)}
+PARTIAL_STAGE_RESULTS = {"scam_json": ("scam_json",), "educational_content": ("narration", "what_if_scenario")}
+
+# Statuses of a job that a duplicate upload may still attach to
+LIVE_STATUSES = ("queued", "running", "retrying")
+
+# Leases a claimed job and counts the attempt, unless its hash has expired
+CLAIM_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('LREM', KEYS[3], 0, ARGV[1])
+    return -1
+end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+redis.call('HSET', KEYS[1], 'status', 'running', 'worker', ARGV[3])
+return redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+"""
+
+# Moves expired leases back to the pending list
+REQUEUE_EXPIRED_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, job_id in ipairs(expired) do
+    redis.call('ZREM', KEYS[1], job_id)
+    if redis.call('LREM', KEYS[2], 0, job_id) > 0 then
+        redis.call('RPUSH', KEYS[3], job_id)
+    end
+end
+return #expired
+"""
+
+
+def encode_output(stage: str, value: Any) -> str:
+    """Serialize a stage output for storage in a Redis hash."""
+    if stage == "frame_bytes":
+        return base64.b64encode(value or b"").decode("utf-8")
+    if isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def decode_output(stage: str, value: str) -> Any:
+    """Inverse of ``encode_output``."""
+    if stage == "frame_bytes":
+        return base64.b64decode(value)
+    if stage in ("scam_json", "educational_content"):
+        return json.loads(value)
+    return value
+
+
+class JobQueue:
+    """Reliable job queue with deduplication, visibility timeouts, retries and a dead-letter list."""
+
+    def __init__(
+        self,
+        redis_client,
+        visibility_timeout: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        job_ttl: Optional[int] = None,
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            redis_client: Redis client created with ``decode_responses=True``
+            visibility_timeout: Seconds a claimed job may go without a heartbeat
+                before another worker may take it (env ``JOB_VISIBILITY_TIMEOUT``)
+            max_attempts: Attempts before a job is dead-lettered (env ``JOB_MAX_ATTEMPTS``)
+            job_ttl: Seconds job data is kept (env ``JOB_TTL``)
+        """
+        self.redis = redis_client
+        self.visibility_timeout = visibility_timeout or int(os.getenv("JOB_VISIBILITY_TIMEOUT", 300))
+        self.max_attempts = max_attempts or int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+        self.job_ttl = job_ttl or int(os.getenv("JOB_TTL", 24 * 60 * 60))
+        self._requeue_expired = redis_client.register_script(REQUEUE_EXPIRED_SCRIPT)
+        self._claim = redis_client.register_script(CLAIM_SCRIPT)
+
+    def submit(self, image_bytes: bytes, digest: str) -> str:
+        """
+        Enqueue an analysis, reusing the live job for the same image if there is one.
+
+        Finished jobs are not reused: whether their result may be served again
+        is up to the result cache.
+
+        Args:
+            image_bytes: Uploaded image bytes
+            digest: SHA-256 of the image, used for deduplication
+
+        Returns:
+            Job id
+        """
+        dedup_key = f"job_dedup:{digest}"
+        job_id = uuid.uuid4().hex
+
+        if not self.redis.set(dedup_key, job_id, nx=True, ex=self.job_ttl):
+            existing_id = self.redis.get(dedup_key)
+            if existing_id and self.redis.hget(f"job:{existing_id}", "status") in LIVE_STATUSES:
+                logger.info(f"Reusing job {existing_id} for duplicate upload")
+                return existing_id
+            self.redis.set(dedup_key, job_id, ex=self.job_ttl)
+
+        pipe = self.redis.pipeline()
+        pipe.hset(f"job:{job_id}", mapping={
+            "id": job_id,
+            "digest": digest,
+            "status": "queued",
+            "attempts": 0,
+            "created": time.time(),
+        })
+        pipe.expire(f"job:{job_id}", self.job_ttl)
+        pipe.set(f"job:{job_id}:image", base64.b64encode(image_bytes).decode("utf-8"), ex=self.job_ttl)
+        pipe.lpush(PENDING_KEY, job_id)
+        pipe.execute()
+
+        logger.info(f"Submitted job {job_id}")
+        return job_id
+
+    def claim(self, worker_id: str, timeout: int = 5) -> Optional[str]:
+        """
+        Block until a job is available and lease it to ``worker_id``.
+
+        Jobs that have used up their attempts are moved to the dead-letter list.
+
+        Returns:
+            Job id, or None if nothing arrived within ``timeout`` seconds or
+            the job's data had expired
+        """
+        job_id = self.redis.blmove(PENDING_KEY, PROCESSING_KEY, timeout, "RIGHT", "LEFT")
+        if not job_id:
+            return None
+
+        attempts = self._claim(
+            keys=[f"job:{job_id}", LEASES_KEY, PROCESSING_KEY],
+            args=[job_id, time.time() + self.visibility_timeout, worker_id],
+        )
+        if attempts < 0:
+            logger.warning(f"Dropped job {job_id}: its data has expired")
+            return None
+
+        if attempts > self.max_attempts:
+            self._dead_letter(job_id, "Visibility timeout exceeded too many times")
+            return None
+        return job_id
+
+    def heartbeat(self, job_id: str):
+        """Extend the lease of a running job."""
+        self.redis.zadd(LEASES_KEY, {job_id: time.time() + self.visibility_timeout}, xx=True)
+
+    def requeue_expired(self) -> int:
+        """Return jobs whose lease expired (e.g. a crashed worker) to the pending list."""
+        requeued = self._requeue_expired(keys=[LEASES_KEY, PROCESSING_KEY, PENDING_KEY], args=[time.time()])
+        if requeued:
+            logger.warning(f"Requeued {requeued} jobs with expired leases")
+        return requeued
+
+    def get_image(self, job_id: str) -> Optional[bytes]:
+        """Fetch the uploaded image for a job."""
+        image_b64 = self.redis.get(f"job:{job_id}:image")
+        return base64.b64decode(image_b64) if image_b64 else None
+
+    def publish_stage(self, job_id: str, stage: str, output: Any):
+        """Store a finished stage output on the job."""
+        if stage in RESULT_STAGES:
+            self.redis.hset(f"job:{job_id}", stage, encode_output(stage, output))
+
+    def publish_partial(self, job_id: str, stage: str, partial_output: Any):
+        """Store the latest partial output of a streaming stage."""
+        if stage in PARTIAL_STAGES:
+            self.redis.hset(f"job:{job_id}", f"partial:{stage}", encode_output(stage, partial_output))
+
+    def complete(self, job_id: str):
+        """Mark a job done and release its lease."""
+        pipe = self.redis.pipeline()
+        pipe.hset(f"job:{job_id}", "status", "done")
+        pipe.hdel(f"job:{job_id}", *[f"partial:{stage}" for stage in PARTIAL_STAGES])
+        pipe.lrem(PROCESSING_KEY, 0, job_id)
+        pipe.zrem(LEASES_KEY, job_id)
+        pipe.delete(f"job:{job_id}:image")
+        pipe.execute()
+        logger.info(f"Completed job {job_id}")
+
+    def fail(self, job_id: str, error: str):
+        """Retry a failed job, or dead-letter it once it has used up its attempts."""
+        attempts = int(self.redis.hget(f"job:{job_id}", "attempts") or 0)
+        if attempts >= self.max_attempts:
+            self._dead_letter(job_id, error)
+            return
+
+        pipe = self.redis.pipeline()
+        pipe.hset(f"job:{job_id}", mapping={"status": "retrying", "error": error})
+        pipe.lrem(PROCESSING_KEY, 0, job_id)
+        pipe.zrem(LEASES_KEY, job_id)
+        pipe.lpush(PENDING_KEY, job_id)
+        pipe.execute()
+        logger.warning(f"Job {job_id} failed (attempt {attempts}), retrying: {error}")
+
+    def _dead_letter(self, job_id: str, error: str):
+        """Move a job to the dead-letter list and mark it failed."""
+        digest = self.redis.hget(f"job:{job_id}", "digest")
+        pipe = self.redis.pipeline()
+        pipe.hset(f"job:{job_id}", mapping={"status": "failed", "error": error})
+        pipe.lrem(PROCESSING_KEY, 0, job_id)
+        pipe.zrem(LEASES_KEY, job_id)
+        pipe.lpush(DEAD_LETTER_KEY, job_id)
+        if digest:
+            pipe.delete(f"job_dedup:{digest}")
+        pipe.execute()
+        logger.error(f"Job {job_id} moved to dead-letter list: {error}")
+
+    def wait_for_result(
+        self,
+        job_id: str,
+        on_stage_complete: Optional[Callable[[str, Any], None]] = None,
+        on_stage_update: Optional[Callable[[str, Any], None]] = None,
+        timeout: Optional[float] = None,
+        poll_interval: float = 0.25,
+    ) -> Dict[str, Any]:
+        """
+        Poll a job until it finishes, delivering stage results as they appear.
+
+        The callbacks have the same signatures as ``PipelineExecutor.run``, so
+        the UI renders queued and inline analyses the same way. Each poll only
+        fetches the fields that have not been delivered yet. Finished stages
+        are delivered before partials, and a partial is only delivered once the
+        stages it is rendered against have been, and until it is superseded.
+
+        Returns:
+            Dictionary mapping result stage names to their outputs
+
+        Raises:
+            RuntimeError: If the job failed or disappeared
+            TimeoutError: If the job did not finish within ``timeout`` seconds
+        """
+        deadline = time.monotonic() + (timeout or self.visibility_timeout * self.max_attempts)
+        outputs: Dict[str, Any] = {}
+        last_partials: Dict[str, str] = {}
+
+        while True:
+            pending_stages = [stage for stage in RESULT_STAGES if stage not in outputs]
+            fields = ["status", "error"] + pending_stages + [f"partial:{stage}" for stage in PARTIAL_STAGES]
+            data = dict(zip(fields, self.redis.hmget(f"job:{job_id}", fields)))
+
+            for stage in pending_stages:
+                if data[stage] is not None:
+                    outputs[stage] = decode_output(stage, data[stage])
+                    if on_stage_complete:
+                        on_stage_complete(stage, outputs[stage])
+
+            for stage in PARTIAL_STAGES:
+                raw = data[f"partial:{stage}"]
+                if not raw or raw == last_partials.get(stage):
+                    continue
+                if any(result in outputs for result in PARTIAL_STAGE_RESULTS[stage]):
+                    continue
+                if not all(dep in outputs for dep in PARTIAL_STAGE_INPUTS[stage]):
+                    continue
+                last_partials[stage] = raw
+                if on_stage_update:
+                    on_stage_update(stage, decode_output(stage, raw))
+
+            status = data["status"]
+            if status == "done":
+                return outputs
+            if status in (None, "failed"):
+                raise RuntimeError(f"Analysis job {job_id} failed: {data['error'] or 'job not found'}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Analysis job {job_id} did not finish in time")
+            time.sleep(poll_interval)
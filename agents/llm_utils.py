@@ -1,51 +1,112 @@
 import re, json
-from openai import OpenAI
-from langchain_openai import ChatOpenAI
+from typing import Dict, Iterator
 from langchain.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
+from langchain_core.output_parsers import JsonOutputParser
+from agents.clients import get_chat_model
+from agents.rate_limit import get_rate_limiter, estimate_tokens
 
-def generate_narration_from_json(scam_json: dict) -> str:
-    """
-    Converts the educational JSON content into TTS-ready narration, 
-    highlighting why it is a scam and identifying key words or cues that indicate the scam.
-    """
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
+# Completion budget assumed when estimating tokens per call
+COMPLETION_TOKEN_ESTIMATE = 800
+
+def _estimate_tokens(messages) -> int:
+    """Estimate the tokens used by a prompt and its completion."""
+    return estimate_tokens(*(m.content for m in messages), max_tokens=COMPLETION_TOKEN_ESTIMATE)
+
+def _what_if_messages(narration: str):
+    """Build the "what if" prompt messages for a scam narration."""
+    # Create a prompt template
+    prompt = ChatPromptTemplate.from_messages([
+        HumanMessagePromptTemplate.from_template(
+            "Given the following narration about a scam, generate a 'what if' scenario "
+            "describing the consequences if a person falls for it. Be clear and concise.\n\n"
+            "Narration:\n{narration}\n\nWhat if scenario:"
+        )
+    ])
     
+    # Format the prompt with the narration
+    return prompt.format_messages(narration=narration)
+
+def _educational_content_messages(scam_json: dict):
+    """Build the prompt messages for narration and "what if" scenario in one response."""
     prompt_template = ChatPromptTemplate.from_messages([
         ("system", 
          "You are a narration assistant for educational videos. "
          "Transform the scam JSON content into clear, neutral, and concise narration suitable for TTS. "
          "Explain why the content is obviously a scam, and highlight key words, phrases, or cues that indicate the scam. "
-         "Do NOT include humor, emojis, or formatting."),
+         "Do NOT include humor, emojis, or formatting. "
+         "Then, based on that narration, generate a 'what if' scenario describing the consequences "
+         "if a person falls for it. Be clear and concise. "
+         "Respond with a JSON object with the string keys 'narration' and 'what_if_scenario', in that order."),
         ("user", 
-         "Use the following scam JSON to generate the narration:\n\n{scam_json}")
+         "Use the following scam JSON to generate the narration and what if scenario:\n\n{scam_json}")
     ])
     
-    messages = prompt_template.format_messages(scam_json=json.dumps(scam_json, indent=2))
-    response = llm.invoke(messages)
+    return prompt_template.format_messages(scam_json=json.dumps(scam_json, indent=2))
+
+def _educational_content_chain():
+    """LLM in JSON mode piped into a parser that also emits partial objects while streaming."""
+    llm = get_chat_model(
+        model="gpt-4o-mini",
+        temperature=0.3,
+        model_kwargs={"response_format": {"type": "json_object"}}
+    )
+    return llm | JsonOutputParser()
+
+def _clean_educational_content(content: dict) -> Dict[str, str]:
+    """Ensure both educational fields exist as stripped strings."""
+    content = content if isinstance(content, dict) else {}
+    return {
+        "narration": str(content.get("narration") or "").strip(),
+        "what_if_scenario": str(content.get("what_if_scenario") or "").strip(),
+    }
+
+def generate_educational_content(scam_json: dict) -> Dict[str, str]:
+    """
+    Generates the narration and the "what if" consequences scenario
+    for a scam JSON result in a single structured LLM call.
+    Returns a dict with 'narration' and 'what_if_scenario'.
+    """
+    messages = _educational_content_messages(scam_json)
+    content = get_rate_limiter("openai").call(
+        _educational_content_chain().invoke, messages, tokens=_estimate_tokens(messages)
+    )
     
-    return response.content.strip()
+    return _clean_educational_content(content)
+
+def stream_educational_content(scam_json: dict) -> Iterator[Dict[str, str]]:
+    """
+    Streaming variant of generate_educational_content.
+    Yields partial dicts as the JSON response arrives; the last one is complete.
+    """
+    messages = _educational_content_messages(scam_json)
+    chain = _educational_content_chain()
+    
+    content = {}
+    for content in get_rate_limiter("openai").stream(
+        lambda: chain.stream(messages), tokens=_estimate_tokens(messages)
+    ):
+        yield content
+    
+    yield _clean_educational_content(content)
+
+def generate_narration_from_json(scam_json: dict) -> str:
+    """
+    Converts the educational JSON content into TTS-ready narration, 
+    highlighting why it is a scam and identifying key words or cues that indicate the scam.
+    """
+    return generate_educational_content(scam_json)["narration"]
 
 def what_if_bot(narration: str) -> str:
     """
     Converts a narration about a scam into a "what if" scenario,
     explaining the possible consequences if the user falls for it.
     """
-    # Initialize the LLM
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
+    # Shared LLM client
+    llm = get_chat_model(model="gpt-4o-mini", temperature=0.3)
     
-    # Create a prompt template
-    prompt = ChatPromptTemplate.from_messages([
-        HumanMessagePromptTemplate.from_template(
-            "Given the following narration about a scam, generate a 'what if' scenario "
-            "describing the consequences if a person falls for it. Be clear and concise.\n\n"
-            "Narration:\n{narration}\n\nWhat if scenario:"
-        )
-    ])
-    
-    # Format the prompt with the narration
-    messages = prompt.format_messages(narration=narration)
+    messages = _what_if_messages(narration)
     
     # Get the LLM response
-    response = llm.invoke(messages)
+    response = get_rate_limiter("openai").call(llm.invoke, messages, tokens=_estimate_tokens(messages))
     
-    return response.content.strip()
\ No newline at end of file
+    return response.content.strip()
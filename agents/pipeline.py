@@ -0,0 +1,315 @@
+"""
+Dependency-graph executor for the home-page analysis pipeline.
+
+Stages are declared by the names of the stages whose outputs they consume.
+Each stage is started as soon as all of its inputs are available, so slow
+independent calls (e.g. DALL·E) run off the critical path.
+"""
+
+import os
+import time
+import queue
+import tempfile
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional
+from agents.semantic_cache import SemanticVerdictCache, get_semantic_cache
+
+# The stage implementations pull in the OpenAI and LangChain clients; they are
+# imported when a pipeline is built so importing this module stays cheap
+if TYPE_CHECKING:
+    from agents.detect_scam import ScamDetector
+
+logger = logging.getLogger(__name__)
+
+# How often the scheduler wakes up to check timeouts and cancellation
+POLL_INTERVAL_SECONDS = 0.1
+
+
+class PipelineError(Exception):
+    """Raised when a stage fails, times out or the run is cancelled."""
+
+    def __init__(self, stage: str, message: str):
+        super().__init__(f"Stage '{stage}' {message}")
+        self.stage = stage
+
+
+class Stage:
+    """A single pipeline stage."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        inputs: Iterable[str] = (),
+        timeout: Optional[float] = None,
+        stream: bool = False,
+    ):
+        """
+        Declare a stage.
+
+        Args:
+            name: Unique stage name, also the key of its output
+            func: Callable invoked with the outputs of ``inputs`` as positional args
+            inputs: Names of the stages this stage depends on
+            timeout: Seconds the stage may run before the pipeline is aborted
+            stream: If True, ``func`` is a generator whose partial output is reported
+                while it runs. Text chunks are concatenated; any other chunk is a
+                snapshot that replaces the previous one. The final value is the output
+        """
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.timeout = timeout
+        self.stream = stream
+
+
+class PipelineExecutor:
+    """Runs a DAG of stages on a thread pool with timeouts, cancellation and timing."""
+
+    def __init__(self, stages: List[Stage], max_workers: int = 4):
+        """
+        Initialize the executor.
+
+        Args:
+            stages: Stages making up the graph
+            max_workers: Size of the worker thread pool
+
+        Raises:
+            ValueError: If stage names clash, an input is undeclared or the graph has a cycle
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+        self.max_workers = max_workers
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self._cancel_event = threading.Event()
+        self._updates: "queue.Queue" = queue.Queue()
+        self._validate()
+
+    def _validate(self):
+        """Ensure every input is declared and the graph is acyclic."""
+        for stage in self.stages.values():
+            for dep in stage.inputs:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle detected at stage '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].inputs:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def _run_streaming(self, stage: Stage, *args) -> Any:
+        """Consume a streaming stage, publishing its partial output after each chunk."""
+        partial = None
+        for chunk in stage.func(*args):
+            if self._cancel_event.is_set():
+                break
+            if isinstance(chunk, str):
+                partial = (partial or "") + chunk
+            else:
+                partial = chunk
+            self._updates.put((stage.name, partial))
+        return partial
+
+    def _drain_updates(self, on_stage_update: Optional[Callable[[str, Any], None]]):
+        """Deliver the latest partial output of each streaming stage."""
+        latest = {}
+        while True:
+            try:
+                name, partial = self._updates.get_nowait()
+            except queue.Empty:
+                break
+            latest[name] = partial
+        if on_stage_update:
+            for name, partial in latest.items():
+                on_stage_update(name, partial)
+
+    def cancel(self):
+        """Request cancellation; stages not yet started will never run."""
+        self._cancel_event.set()
+
+    def run(
+        self,
+        on_stage_complete: Optional[Callable[[str, Any], None]] = None,
+        on_stage_update: Optional[Callable[[str, Any], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Execute the graph.
+
+        Both callbacks are called from the calling thread, which makes it
+        safe to update Streamlit elements from them.
+
+        Args:
+            on_stage_complete: Optional callback ``(stage_name, output)``
+            on_stage_update: Optional callback ``(stage_name, partial_output)`` for streaming stages
+
+        Returns:
+            Dictionary mapping stage names to their outputs
+
+        Raises:
+            PipelineError: If a stage raises, exceeds its timeout or the run is cancelled
+        """
+        results: Dict[str, Any] = {}
+        pending = dict(self.stages)
+        running = {}
+        run_started = time.monotonic()
+        self.timings = {}
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while pending or running:
+                if self._cancel_event.is_set():
+                    in_flight = ", ".join(stage.name for stage in running.values())
+                    raise PipelineError(in_flight or "pending", "cancelled")
+
+                # Start every stage whose inputs are ready
+                for name, stage in list(pending.items()):
+                    if all(dep in results for dep in stage.inputs):
+                        args = [results[dep] for dep in stage.inputs]
+                        if stage.stream:
+                            future = pool.submit(self._run_streaming, stage, *args)
+                        else:
+                            future = pool.submit(stage.func, *args)
+                        running[future] = stage
+                        self.timings[name] = {"start": time.monotonic() - run_started}
+                        del pending[name]
+
+                done, _ = wait(running, timeout=POLL_INTERVAL_SECONDS, return_when=FIRST_COMPLETED)
+                self._drain_updates(on_stage_update)
+
+                for future in done:
+                    stage = running.pop(future)
+                    timing = self.timings[stage.name]
+                    timing["duration"] = time.monotonic() - run_started - timing["start"]
+                    try:
+                        results[stage.name] = future.result()
+                    except Exception as e:
+                        raise PipelineError(stage.name, f"failed: {str(e)}") from e
+                    logger.info(f"Stage '{stage.name}' finished in {timing['duration']:.2f}s")
+                    if on_stage_complete:
+                        on_stage_complete(stage.name, results[stage.name])
+
+                # Enforce per-stage timeouts; the worker thread itself cannot be
+                # interrupted, but its result is abandoned
+                elapsed = time.monotonic() - run_started
+                for stage in running.values():
+                    if stage.timeout and elapsed - self.timings[stage.name]["start"] > stage.timeout:
+                        raise PipelineError(stage.name, f"timed out after {stage.timeout}s")
+
+            return results
+        finally:
+            for future in running:
+                future.cancel()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _starter_frame_bytes(script_text: str) -> bytes:
+    """Generate the starter frame into a temporary file and return its bytes."""
+    from agents.image_utils import generate_starter_frame
+
+    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
+        frame_path = f.name
+    try:
+        generate_starter_frame(script_text, frame_path)
+        with open(frame_path, "rb") as f:
+            return f.read()
+    finally:
+        try:
+            os.unlink(frame_path)
+        except OSError:
+            pass
+
+
+def _detect_with_semantic_cache(
+    detector: "ScamDetector",
+    semantic_cache: SemanticVerdictCache,
+    extracted_text: str,
+) -> Iterator[Dict]:
+    """Reuse the verdict of a near-identical text, or stream a fresh detection and remember it."""
+    verdict = semantic_cache.lookup(extracted_text)
+    if verdict is not None:
+        yield verdict
+        return
+
+    verdict = None
+    for verdict in detector.detect_scam_text_stream(extracted_text):
+        yield verdict
+    if verdict is not None:
+        semantic_cache.store(extracted_text, verdict)
+
+
+def build_analysis_pipeline(
+    file_bytes: bytes,
+    combined_mode: Optional[bool] = None,
+    semantic_cache: Optional[SemanticVerdictCache] = None,
+) -> PipelineExecutor:
+    """
+    Build the home-page analysis graph.
+
+    OCR feeds scam detection and the starter frame; the frame is generated
+    in parallel with detection and the educational content. Narration and the
+    what-if scenario come from one streaming ``educational_content`` call and
+    are split out of its result; detection also streams.
+
+    In combined mode OCR and detection come from one ``image_analysis`` vision
+    call, and ``extracted_text``/``scam_json`` are split out of its result.
+
+    Otherwise detection first looks for a near-identical, previously analysed
+    text in the semantic cache and reuses its verdict. Both modes add fresh
+    verdicts to the cache.
+
+    Args:
+        file_bytes: Uploaded image bytes
+        combined_mode: Override ``ScamDetector`` combined mode
+        semantic_cache: Override the process-wide semantic cache
+
+    Returns:
+        A ready-to-run PipelineExecutor
+    """
+    from agents.detect_scam import ScamDetector
+    from agents.llm_utils import stream_educational_content
+
+    detector = ScamDetector(combined_mode=combined_mode)
+    semantic_cache = semantic_cache or get_semantic_cache()
+
+    if detector.combined_mode:
+        def remember_verdict(analysis, extracted_text):
+            if semantic_cache:
+                semantic_cache.store(*analysis)
+            return analysis[1]
+
+        detection_stages = [
+            Stage("image_analysis", lambda: detector.analyze_image(file_bytes), timeout=90),
+            Stage("extracted_text", lambda analysis: analysis[0], inputs=["image_analysis"]),
+            # Ordered after extracted_text, which consumers render the verdict against
+            Stage("scam_json", remember_verdict, inputs=["image_analysis", "extracted_text"]),
+        ]
+    else:
+        if semantic_cache:
+            detect = lambda text: _detect_with_semantic_cache(detector, semantic_cache, text)
+        else:
+            detect = detector.detect_scam_text_stream
+        detection_stages = [
+            Stage("extracted_text", lambda: detector.ocr_with_openai(file_bytes), timeout=60),
+            Stage("scam_json", detect, inputs=["extracted_text"], timeout=60, stream=True),
+        ]
+
+    return PipelineExecutor(detection_stages + [
+        Stage("frame_bytes", _starter_frame_bytes, inputs=["extracted_text"], timeout=120),
+        Stage("educational_content", stream_educational_content, inputs=["scam_json"], timeout=90, stream=True),
+        Stage("narration", lambda content: content["narration"], inputs=["educational_content"]),
+        Stage("what_if_scenario", lambda content: content["what_if_scenario"], inputs=["educational_content"]),
+    ])
@@ -0,0 +1,313 @@
+"""
+Process-wide rate limiting for OpenAI calls.
+
+Combines token buckets for requests and tokens per minute (in-process, or
+shared across processes through Redis), AIMD adaptive concurrency and
+jittered exponential backoff that honours ``Retry-After``.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_EXCEPTION_NAMES = {"APIConnectionError", "APITimeoutError"}
+
+# Defaults per limiter; each can be overridden with <NAME>_RPM, <NAME>_TPM,
+# <NAME>_MAX_CONCURRENCY and <NAME>_MIN_CONCURRENCY environment variables
+LIMITER_DEFAULTS = {
+    "openai": {"rpm": 500, "tpm": 200000, "max_concurrency": 16, "min_concurrency": 1},
+    "openai_images": {"rpm": 7, "tpm": 0, "max_concurrency": 4, "min_concurrency": 1},
+}
+
+# Atomic refill-and-take; returns the seconds to wait before ``amount`` is available
+REDIS_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local amount = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= amount then
+    tokens = tokens - amount
+else
+    wait = (amount - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) * 2 + 1)
+return tostring(wait)
+"""
+
+
+def estimate_tokens(*texts: str, max_tokens: int = 0) -> int:
+    """Rough token estimate (~4 characters per token) plus the completion budget."""
+    return sum(len(text or "") for text in texts) // 4 + max_tokens
+
+
+class TokenBucket:
+    """In-process token bucket refilled continuously at ``per_minute`` units per minute."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, amount: float) -> float:
+        """Take ``amount`` units if available; otherwise return the seconds to wait."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+
+class RedisTokenBucket:
+    """Token bucket stored in Redis, shared by every process using the same key."""
+
+    def __init__(self, redis_client, key: str, per_minute: float):
+        self.redis = redis_client
+        self.key = key
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self._script = redis_client.register_script(REDIS_TOKEN_BUCKET_SCRIPT)
+
+    def try_acquire(self, amount: float) -> float:
+        """Take ``amount`` units if available; otherwise return the seconds to wait."""
+        amount = min(amount, self.capacity)
+        return float(self._script(keys=[self.key], args=[self.rate, self.capacity, amount]))
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit: +1/limit per success, halved on throttling."""
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Block until a slot under the current limit is free."""
+        with self._cond:
+            while self.in_flight >= max(self.min_limit, int(self.limit)):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self):
+        """Free a slot."""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        """Additive increase."""
+        with self._cond:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def on_throttle(self):
+        """Multiplicative decrease."""
+        with self._cond:
+            self.limit = max(self.min_limit, self.limit / 2)
+            logger.warning(f"Throttled; concurrency limit lowered to {int(self.limit)}")
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Whether an API error is worth retrying."""
+    status = getattr(error, "status_code", None)
+    return status in RETRYABLE_STATUS_CODES or type(error).__name__ in RETRYABLE_EXCEPTION_NAMES
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds requested by the server's ``Retry-After`` header, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """Rate-limited, retrying executor for API calls."""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        redis_client=None,
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            name: Limiter name, also the Redis key suffix when shared
+            requests_per_minute: Request quota
+            tokens_per_minute: Token quota; 0 disables token limiting
+            max_concurrency: Upper bound for adaptive concurrency
+            min_concurrency: Lower bound for adaptive concurrency
+            max_retries: Retries for retryable errors before giving up
+            base_delay: First backoff delay in seconds
+            max_delay: Backoff cap in seconds
+            redis_client: Share the buckets across processes through Redis
+        """
+        self.name = name
+        if redis_client is not None:
+            self.request_bucket = RedisTokenBucket(redis_client, f"rate_limit:{name}:requests", requests_per_minute)
+            self.token_bucket = (RedisTokenBucket(redis_client, f"rate_limit:{name}:tokens", tokens_per_minute)
+                                 if tokens_per_minute else None)
+        else:
+            self.request_bucket = TokenBucket(requests_per_minute)
+            self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency, min_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _wait_for_quota(self, tokens: int):
+        """Block until both the request and token buckets allow the call."""
+        for bucket, amount in ((self.request_bucket, 1), (self.token_bucket, tokens)):
+            if bucket is None or amount <= 0:
+                continue
+            while True:
+                wait = bucket.try_acquire(amount)
+                if wait <= 0:
+                    break
+                time.sleep(wait)
+
+    def _backoff(self, attempt: int, error: Exception):
+        """Sleep before the next attempt, honouring ``Retry-After``."""
+        if getattr(error, "status_code", None) == 429:
+            self.concurrency.on_throttle()
+        delay = _retry_after(error)
+        if delay is None:
+            # Full jitter exponential backoff
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        logger.warning(f"{self.name} call failed ({str(error)}); retry {attempt + 1} in {delay:.1f}s")
+        time.sleep(delay)
+
+    def call(self, func: Callable[..., Any], *args, tokens: int = 0, **kwargs) -> Any:
+        """
+        Call ``func`` under the rate limit, retrying retryable errors.
+
+        Args:
+            func: API call to make
+            tokens: Estimated tokens consumed by the call
+            *args, **kwargs: Passed to ``func``
+
+        Returns:
+            Whatever ``func`` returns
+        """
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_quota(tokens)
+            self.concurrency.acquire()
+            try:
+                result = func(*args, **kwargs)
+                self.concurrency.on_success()
+                return result
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                error = e
+            finally:
+                self.concurrency.release()
+            self._backoff(attempt, error)
+
+    def stream(self, make_stream: Callable[[], Iterable], tokens: int = 0) -> Iterator:
+        """
+        Iterate a streaming API call under the rate limit.
+
+        The concurrency slot is held until the stream is exhausted. Retryable
+        errors are retried only if no chunk has been yielded yet.
+
+        Args:
+            make_stream: Zero-argument callable that starts the stream
+            tokens: Estimated tokens consumed by the call
+
+        Yields:
+            Chunks of the underlying stream
+        """
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_quota(tokens)
+            self.concurrency.acquire()
+            started = False
+            try:
+                for chunk in make_stream():
+                    started = True
+                    yield chunk
+                self.concurrency.on_success()
+                return
+            except Exception as e:
+                if started or attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                error = e
+            finally:
+                self.concurrency.release()
+            self._backoff(attempt, error)
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _shared_redis_client():
+    """Redis client for cross-process limits when ``RATE_LIMIT_BACKEND=redis``."""
+    if os.getenv("RATE_LIMIT_BACKEND", "local").lower() != "redis":
+        return None
+    try:
+        from agents.clients import get_redis_client
+
+        return get_redis_client(decode_responses=False)
+    except Exception as e:
+        logger.warning(f"Redis rate limit backend unavailable, using in-process limits: {str(e)}")
+        return None
+
+
+def get_rate_limiter(name: str = "openai") -> RateLimiter:
+    """Get the process-wide limiter called ``name``, configured from the environment."""
+    limiter = _limiters.get(name)
+    if limiter is not None:
+        return limiter
+    with _limiters_lock:
+        if name not in _limiters:
+            defaults = LIMITER_DEFAULTS.get(name, LIMITER_DEFAULTS["openai"])
+            prefix = name.upper()
+            _limiters[name] = RateLimiter(
+                name,
+                requests_per_minute=float(os.getenv(f"{prefix}_RPM", defaults["rpm"])),
+                tokens_per_minute=float(os.getenv(f"{prefix}_TPM", defaults["tpm"])),
+                max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", defaults["max_concurrency"])),
+                min_concurrency=int(os.getenv(f"{prefix}_MIN_CONCURRENCY", defaults["min_concurrency"])),
+                max_retries=int(os.getenv("RATE_LIMIT_MAX_RETRIES", 5)),
+                redis_client=_shared_redis_client(),
+            )
+        return _limiters[name]
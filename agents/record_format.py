@@ -0,0 +1,126 @@
+"""
+Versioned binary encoding for the ``analysis`` field of history records.
+
+Layout of an encoded record::
+
+    magic (3 bytes, b"TLR") | version (1 byte) | codec (1 byte) | payload
+
+Version 1 payloads are compact UTF-8 JSON, compressed with the codec named
+in the header. Records written before this format are plain JSON text and
+are recognised by their missing magic.
+"""
+
+import os
+import json
+import zlib
+import logging
+from typing import Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+RECORD_MAGIC = b"TLR"
+RECORD_VERSION = 1
+HEADER_SIZE = len(RECORD_MAGIC) + 2
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODECS = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+# Payloads smaller than this are stored uncompressed
+MIN_COMPRESS_BYTES = 128
+
+
+def _zstd():
+    """Import the optional ``zstandard`` package."""
+    import zstandard
+
+    return zstandard
+
+
+def _compress(payload: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZLIB:
+        return zlib.compress(payload, 6)
+    if codec == CODEC_ZSTD:
+        return _zstd().ZstdCompressor(level=6).compress(payload)
+    return payload
+
+
+def _decompress(payload: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload)
+    if codec == CODEC_ZSTD:
+        return _zstd().ZstdDecompressor().decompress(payload)
+    if codec == CODEC_NONE:
+        return payload
+    raise ValueError(f"Unknown record codec {codec}")
+
+
+def default_compression() -> str:
+    """Compression for new records from ``HISTORY_COMPRESSION`` (zlib, zstd or none)."""
+    compression = os.getenv("HISTORY_COMPRESSION", "zlib").lower()
+    if compression not in CODECS:
+        logger.warning(f"Unknown HISTORY_COMPRESSION {compression!r}, using zlib")
+        return "zlib"
+    if compression == "zstd":
+        try:
+            _zstd()
+        except ImportError:
+            logger.warning("zstandard is not installed, using zlib for history records")
+            return "zlib"
+    return compression
+
+
+def encode_analysis(analysis: Dict, compression: Optional[str] = None) -> bytes:
+    """
+    Encode an analysis in the current record format.
+
+    Args:
+        analysis: Scam detection result
+        compression: "zlib", "zstd" or "none" (defaults to ``HISTORY_COMPRESSION``)
+
+    Returns:
+        Encoded record bytes
+    """
+    payload = json.dumps(analysis, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    codec = CODECS[compression or default_compression()]
+    if len(payload) < MIN_COMPRESS_BYTES:
+        codec = CODEC_NONE
+    return RECORD_MAGIC + bytes((RECORD_VERSION, codec)) + _compress(payload, codec)
+
+
+def is_legacy(raw: Union[bytes, str]) -> bool:
+    """Whether a stored value predates the versioned format."""
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    return not raw.startswith(RECORD_MAGIC)
+
+
+def decode_analysis(raw: Union[bytes, str]) -> Dict:
+    """
+    Decode an analysis stored in any record format.
+
+    Args:
+        raw: Stored ``analysis`` field
+
+    Returns:
+        The analysis dictionary
+
+    Raises:
+        ValueError: If the record is corrupt or from an unknown version
+    """
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    if is_legacy(raw):
+        return json.loads(raw)
+
+    version, codec = raw[len(RECORD_MAGIC)], raw[len(RECORD_MAGIC) + 1]
+    if version != RECORD_VERSION:
+        raise ValueError(f"Unsupported history record version {version}")
+    try:
+        payload = _decompress(raw[HEADER_SIZE:], codec)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Corrupt history record: {str(e)}") from e
+    return json.loads(payload)
@@ -0,0 +1,185 @@
+"""
+Content-addressed cache for home-page analysis results.
+
+Results are keyed by the SHA-256 of the uploaded image bytes so that the
+same screenshot uploaded by different users is only analysed once. Entries
+are bounded both in number and in total bytes; the generated frame, by far
+the largest part, is stored raw on the binary-safe connection.
+"""
+
+import os
+import json
+import base64
+import hashlib
+import logging
+import time
+from typing import Dict, Optional
+from agents.detect_scam import is_fallback_result
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "analysis_cache:"
+CACHE_FRAME_KEY_PREFIX = "analysis_cache_frame:"
+CACHE_INDEX_KEY = "analysis_cache_index"
+CACHE_SIZES_KEY = "analysis_cache_sizes"
+CACHE_BYTES_KEY = "analysis_cache_bytes"
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60  # 7 days
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB
+
+
+def content_hash(file_bytes: bytes) -> str:
+    """Return the SHA-256 hex digest of the uploaded bytes."""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+class ResultCache:
+    """Redis-backed result cache with TTL and LRU size-bounded eviction."""
+
+    def __init__(
+        self,
+        redis_client,
+        blob_client=None,
+        ttl_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            redis_client: Redis client created with ``decode_responses=True``
+            blob_client: Redis client created with ``decode_responses=False``
+                for the raw frames; without it frames are stored base64-encoded
+            ttl_seconds: Expiry for each entry (env ``ANALYSIS_CACHE_TTL``)
+            max_entries: Upper bound on cached entries (env ``ANALYSIS_CACHE_MAX_ENTRIES``)
+            max_bytes: Upper bound on the total size of cached entries
+                (env ``ANALYSIS_CACHE_MAX_BYTES``)
+        """
+        self.redis = redis_client
+        self.blob = blob_client
+        self.ttl_seconds = ttl_seconds or int(os.getenv("ANALYSIS_CACHE_TTL", DEFAULT_TTL_SECONDS))
+        self.max_entries = max_entries or int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self.max_bytes = max_bytes or int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+
+    def get(self, digest: str) -> Optional[Dict]:
+        """
+        Fetch a cached analysis.
+
+        Args:
+            digest: SHA-256 of the uploaded image
+
+        Returns:
+            Dictionary with ``extracted_text``, ``scam_json``, ``narration``,
+            ``what_if_scenario`` and ``frame_bytes``, or None on a miss
+            (including when the frame has expired or been evicted on its own)
+        """
+        if not self.redis:
+            return None
+        try:
+            # Index entries of expired results are left for _evict to clean up
+            data = self.redis.hgetall(f"{CACHE_KEY_PREFIX}{digest}")
+            if not data:
+                return None
+
+            if "frame" in data:
+                frame_bytes = base64.b64decode(data["frame"])
+            else:
+                frame_bytes = self.blob.get(f"{CACHE_FRAME_KEY_PREFIX}{digest}") if self.blob else None
+            if not frame_bytes:
+                return None
+
+            # Refresh recency for LRU eviction
+            self.redis.zadd(CACHE_INDEX_KEY, {digest: time.time()})
+
+            return {
+                "extracted_text": data.get("extracted_text", ""),
+                "scam_json": json.loads(data.get("scam_json", "{}")),
+                "narration": data.get("narration", ""),
+                "what_if_scenario": data.get("what_if_scenario", ""),
+                "frame_bytes": frame_bytes,
+            }
+        except Exception as e:
+            logger.warning(f"Result cache lookup failed: {str(e)}")
+            return None
+
+    def set(self, digest: str, result: Dict) -> bool:
+        """
+        Store an analysis result and evict least recently used entries.
+
+        Fallback verdicts from failed detection calls are not stored, so a
+        transient API error is not served to every later upload of the image.
+
+        Args:
+            digest: SHA-256 of the uploaded image
+            result: Dictionary in the shape returned by ``get``
+
+        Returns:
+            True if the entry was stored
+        """
+        if not self.redis:
+            return False
+        if is_fallback_result(result.get("scam_json") or {}):
+            logger.info(f"Not caching analysis {digest[:12]}: detection failed")
+            return False
+        if not result.get("frame_bytes"):
+            # get() treats a missing frame as a miss
+            return False
+        try:
+            key = f"{CACHE_KEY_PREFIX}{digest}"
+            frame_bytes = result.get("frame_bytes") or b""
+            storage_data = {
+                "extracted_text": result.get("extracted_text", ""),
+                "scam_json": json.dumps(result.get("scam_json", {})),
+                "narration": result.get("narration", ""),
+                "what_if_scenario": result.get("what_if_scenario", ""),
+            }
+            if self.blob:
+                self.blob.set(f"{CACHE_FRAME_KEY_PREFIX}{digest}", frame_bytes, ex=self.ttl_seconds)
+            else:
+                storage_data["frame"] = base64.b64encode(frame_bytes).decode("utf-8")
+            size = len(frame_bytes) + sum(len(value.encode("utf-8")) for value in storage_data.values())
+
+            previous_size = int(self.redis.hget(CACHE_SIZES_KEY, digest) or 0)
+            pipe = self.redis.pipeline()
+            pipe.delete(key)
+            pipe.hset(key, mapping=storage_data)
+            pipe.expire(key, self.ttl_seconds)
+            pipe.zadd(CACHE_INDEX_KEY, {digest: time.time()})
+            pipe.hset(CACHE_SIZES_KEY, digest, size)
+            pipe.incrby(CACHE_BYTES_KEY, size - previous_size)
+            pipe.execute()
+
+            self._evict()
+            return True
+        except Exception as e:
+            logger.warning(f"Result cache store failed: {str(e)}")
+            return False
+
+    def _forget(self, digests) -> int:
+        """Delete entries and their index and size bookkeeping; returns the bytes freed."""
+        sizes = self.redis.hmget(CACHE_SIZES_KEY, digests)
+        freed = sum(int(size or 0) for size in sizes)
+        pipe = self.redis.pipeline()
+        pipe.zrem(CACHE_INDEX_KEY, *digests)
+        pipe.delete(*[f"{CACHE_KEY_PREFIX}{digest}" for digest in digests],
+                    *[f"{CACHE_FRAME_KEY_PREFIX}{digest}" for digest in digests])
+        pipe.hdel(CACHE_SIZES_KEY, *digests)
+        pipe.decrby(CACHE_BYTES_KEY, freed)
+        pipe.execute()
+        return freed
+
+    def _evict(self):
+        """Remove the least recently used entries beyond ``max_entries`` or ``max_bytes``."""
+        count = self.redis.zcard(CACHE_INDEX_KEY)
+        total = int(self.redis.get(CACHE_BYTES_KEY) or 0)
+        evicted = 0
+        while count > self.max_entries or total > self.max_bytes:
+            popped = self.redis.zpopmin(CACHE_INDEX_KEY, max(1, count - self.max_entries))
+            if not popped:
+                break
+            total -= self._forget([digest for digest, _ in popped])
+            count -= len(popped)
+            evicted += len(popped)
+        if evicted:
+            logger.info(f"Evicted {evicted} cached analyses")
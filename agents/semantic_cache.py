@@ -0,0 +1,166 @@
+"""
+Semantic near-duplicate lookup for scam detection.
+
+Scam texts are re-circulated with small rewordings that defeat the exact
+image-hash result cache. Before paying for a detection call, the OCR text is
+embedded and compared against previously analysed texts in the vector store;
+a match above the similarity threshold reuses the stored verdict.
+"""
+
+import os
+import json
+import logging
+import threading
+from typing import Dict, Optional
+from agents.detect_scam import is_fallback_result
+
+logger = logging.getLogger(__name__)
+
+VERDICT_COLLECTION = "scam_verdicts"
+STATS_KEY = "semantic_cache_stats"
+DEFAULT_THRESHOLD = 0.95
+
+
+class SemanticVerdictCache:
+    """Reuses detection verdicts of near-identical texts and counts hits and misses."""
+
+    def __init__(self, threshold: Optional[float] = None, redis_client=None):
+        """
+        Initialize the cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a reuse (env ``SEMANTIC_CACHE_THRESHOLD``)
+            redis_client: Optional Redis client (``decode_responses=True``) for
+                hit/miss counters shared by all processes
+        """
+        self.threshold = threshold or float(os.getenv("SEMANTIC_CACHE_THRESHOLD", DEFAULT_THRESHOLD))
+        self.redis = redis_client
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _collection(self):
+        """Vector store collection of analysed texts, opened on first use."""
+        from agents.vectorstore import get_collection
+
+        return get_collection(VERDICT_COLLECTION)
+
+    @staticmethod
+    def _embed(text: str):
+        """Rate-limited, cached embedding of ``text``."""
+        from agents.vectorstore import embed_texts
+
+        return embed_texts([text])[0]
+
+    def _record(self, outcome: str):
+        """Count a hit or a miss."""
+        with self._lock:
+            if outcome == "hits":
+                self.hits += 1
+            else:
+                self.misses += 1
+        if self.redis is not None:
+            try:
+                self.redis.hincrby(STATS_KEY, outcome, 1)
+            except Exception as e:
+                logger.warning(f"Failed to record semantic cache {outcome}: {str(e)}")
+
+    def lookup(self, text: str) -> Optional[Dict]:
+        """
+        Find the verdict of a previously analysed, near-identical text.
+
+        Args:
+            text: OCR text about to be analysed
+
+        Returns:
+            The stored scam detection result, or None on a miss
+        """
+        if not text.strip():
+            return None
+        try:
+            from agents.vectorstore import search_embedded
+
+            matches = search_embedded(self._collection(), self._embed(text), k=1)
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {str(e)}")
+            self._record("misses")
+            return None
+
+        if matches:
+            _, metadata, similarity = matches[0]
+            if similarity >= self.threshold:
+                # Rows written by other tools may carry no usable verdict
+                try:
+                    verdict = json.loads(metadata["verdict"])
+                except (KeyError, TypeError, ValueError):
+                    verdict = None
+                if isinstance(verdict, dict) and not is_fallback_result(verdict):
+                    self._record("hits")
+                    logger.info(f"Semantic cache hit (similarity {similarity:.3f})")
+                    return verdict
+
+        self._record("misses")
+        return None
+
+    def store(self, text: str, verdict: Dict):
+        """
+        Remember the verdict for an analysed text.
+
+        Args:
+            text: OCR text that was analysed
+            verdict: Validated scam detection result
+        """
+        if not text.strip() or is_fallback_result(verdict):
+            return
+        try:
+            from agents.vectorstore import write_embedded
+
+            # Keyed by the text, so re-analysing it replaces its verdict; the
+            # embedding is served from the cache filled by the lookup
+            write_embedded(self._collection(), [text], [self._embed(text)], [{"verdict": json.dumps(verdict)}])
+        except Exception as e:
+            logger.warning(f"Failed to store verdict in semantic cache: {str(e)}")
+
+    def stats(self) -> Dict:
+        """
+        Hit and miss counts, across processes when Redis is configured.
+
+        Returns:
+            Dictionary with ``hits``, ``misses`` and ``hit_rate``
+        """
+        hits, misses = self.hits, self.misses
+        if self.redis is not None:
+            try:
+                shared = self.redis.hgetall(STATS_KEY)
+                hits, misses = int(shared.get("hits", 0)), int(shared.get("misses", 0))
+            except Exception as e:
+                logger.warning(f"Failed to read semantic cache stats: {str(e)}")
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+
+
+_cache: Optional[SemanticVerdictCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticVerdictCache]:
+    """
+    Get the process-wide semantic cache.
+
+    Returns:
+        The cache, or None if disabled with ``SEMANTIC_CACHE=off``
+    """
+    global _cache
+    if os.getenv("SEMANTIC_CACHE", "on").lower() in ("off", "false", "0"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                from agents.clients import get_redis_client
+
+                redis_client = get_redis_client()
+            except Exception as e:
+                logger.warning(f"Semantic cache stats will be per-process: {str(e)}")
+                redis_client = None
+            _cache = SemanticVerdictCache(redis_client=redis_client)
+        return _cache
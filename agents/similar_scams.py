@@ -0,0 +1,198 @@
+"""
+"Similar past scams" lookup over saved analyses.
+
+Every analysis saved to the feed is embedded into the ``history_analyses``
+vector store collection with its risk level, scam type, category and save
+time as metadata. Lookups are approximate nearest-neighbour (HNSW) queries
+that can be restricted by that metadata. The HNSW parameters are tunable
+with ``HISTORY_ANN_M``, ``HISTORY_ANN_CONSTRUCTION_EF`` and
+``HISTORY_ANN_SEARCH_EF``; ``benchmark_ann.py`` measures their recall and
+latency.
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from agents.history_store import DEFAULT_TTL_SECONDS, FACET_FIELDS, HISTORY_INDEX_KEY, facet_values
+
+logger = logging.getLogger(__name__)
+
+HISTORY_COLLECTION = "history_analyses"
+DEFAULT_INDEX_PARAMS = {"M": 16, "construction_ef": 200, "search_ef": 64}
+# Minimum seconds between expiry prunes triggered by new analyses
+PRUNE_INTERVAL_SECONDS = 60 * 60
+
+_last_prune = float("-inf")
+_prune_lock = threading.Lock()
+
+
+def index_params() -> Dict[str, int]:
+    """HNSW parameters of the collection, from the environment."""
+    return {
+        f"hnsw:{name}": int(os.getenv(f"HISTORY_ANN_{name.upper()}", default))
+        for name, default in DEFAULT_INDEX_PARAMS.items()
+    }
+
+
+def _collection():
+    """The history collection, opened on first use."""
+    from agents.vectorstore import get_collection
+
+    return get_collection(HISTORY_COLLECTION, index_params())
+
+
+def _max_age_seconds() -> int:
+    """Age beyond which analyses have left the feed."""
+    return int(os.getenv("HISTORY_TTL", DEFAULT_TTL_SECONDS))
+
+
+def document_text(analysis: Dict, extracted_text: str = "") -> str:
+    """Text embedded for an analysis: the OCR text, or its phrases and reasoning if there is none."""
+    if extracted_text and extracted_text.strip():
+        return extracted_text.strip()
+    return " ".join(list(analysis.get("scam_phrases", [])) + [analysis.get("analysis", "")]).strip()
+
+
+def index_analyses(entries: List[Tuple[str, Dict, str, float]]) -> int:
+    """
+    Embed and upsert saved analyses in one batch.
+
+    Args:
+        entries: (analysis id, analysis, extracted text, save timestamp) tuples
+
+    Returns:
+        Number of analyses indexed
+    """
+    from agents.vectorstore import embed_texts
+
+    ids, texts, metadatas = [], [], []
+    for analysis_id, analysis, extracted_text, timestamp in entries:
+        text = document_text(analysis, extracted_text)
+        if not text:
+            continue
+        ids.append(analysis_id)
+        texts.append(text)
+        metadatas.append({"analysis_id": analysis_id, "timestamp": timestamp, **facet_values(analysis)})
+    if not ids:
+        return 0
+
+    # The OCR text was usually embedded already by the semantic verdict
+    # lookup, so this is served from the embedding cache
+    _collection().upsert(
+        ids=ids,
+        embeddings=embed_texts(texts),
+        documents=texts,
+        metadatas=metadatas,
+    )
+    return len(ids)
+
+
+def index_analysis(analysis_id: str, analysis: Dict, extracted_text: str = "", timestamp: Optional[float] = None):
+    """Index one saved analysis, pruning expired ones at most hourly; failures are logged, never raised."""
+    global _last_prune
+    try:
+        index_analyses([(analysis_id, analysis, extracted_text, timestamp or time.time())])
+        with _prune_lock:
+            due = time.monotonic() - _last_prune >= PRUNE_INTERVAL_SECONDS
+            if due:
+                _last_prune = time.monotonic()
+        if due:
+            prune_expired()
+    except Exception as e:
+        logger.warning(f"Failed to index analysis {analysis_id} for similarity search: {str(e)}")
+
+
+def find_similar(
+    text: str,
+    k: int = 5,
+    filters: Optional[Dict[str, str]] = None,
+    exclude_id: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Find the saved analyses most similar to ``text``.
+
+    Args:
+        text: OCR text (or ``document_text``) of the analysis to compare
+        k: Number of results
+        filters: Facet field -> required value, applied inside the ANN search
+        exclude_id: Analysis to leave out (the one being viewed)
+
+    Returns:
+        Metadata of the matches (``analysis_id``, ``timestamp``, facet fields)
+        plus ``similarity`` and ``text``, most similar first
+    """
+    if not text.strip():
+        return []
+
+    # Only facet restrictions are filtered on; expired analyses are pruned
+    # from the index instead, so unrestricted lookups stay unfiltered
+    clauses = [{field: value} for field, value in (filters or {}).items() if field in FACET_FIELDS and value]
+    where = None
+    if clauses:
+        where = clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    from agents.vectorstore import embed_texts, search_embedded
+
+    collection = _collection()
+    vector = embed_texts([text])[0]
+    cutoff = time.time() - _max_age_seconds()
+    n_results = k + (1 if exclude_id else 0)
+    started = time.monotonic()
+    while True:
+        matches = search_embedded(collection, vector, k=n_results, where=where)
+        # Analyses expired since the last prune are dropped here
+        results = [
+            {**metadata, "similarity": similarity, "text": document}
+            for document, metadata, similarity in matches
+            if metadata.get("analysis_id") != exclude_id and metadata.get("timestamp", 0) >= cutoff
+        ]
+        # A short page means there are no more matches to fill the gap with
+        if len(results) >= k or len(matches) < n_results:
+            break
+        n_results *= 2
+    logger.debug(f"Similar scam lookup took {(time.monotonic() - started) * 1000:.1f} ms")
+    return results[:k]
+
+
+def prune_expired() -> None:
+    """Delete analyses that have left the feed from the index."""
+    _collection().delete(where={"timestamp": {"$lt": time.time() - _max_age_seconds()}})
+
+
+def index_history(history_store, batch_size: int = 100) -> int:
+    """
+    Index saved analyses that are not in the collection yet.
+
+    Args:
+        history_store: ``HistoryStore`` to read the feed from
+        batch_size: Records per batch
+
+    Returns:
+        Number of analyses indexed
+    """
+    indexed = 0
+    batch = []
+
+    def index_batch(history_ids):
+        existing = set(_collection().get(ids=history_ids, include=[])["ids"])
+        missing = [history_id for history_id in history_ids if history_id not in existing]
+        entries = []
+        for item in history_store.get_items(missing):
+            try:
+                timestamp = datetime.fromisoformat(item['timestamp']).timestamp()
+            except ValueError:
+                timestamp = time.time()
+            entries.append((item['id'], item['analysis'], history_store.get_extracted_text(item['id']), timestamp))
+        return index_analyses(entries)
+
+    for history_id, _ in history_store.redis.zscan_iter(HISTORY_INDEX_KEY, count=batch_size):
+        batch.append(history_id)
+        if len(batch) >= batch_size:
+            indexed += index_batch(batch)
+            batch = []
+    if batch:
+        indexed += index_batch(batch)
+    return indexed
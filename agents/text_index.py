@@ -0,0 +1,67 @@
+"""
+Tokenization and term weighting for the history search index.
+
+Saved analyses are indexed by the words of their OCR text and scam phrases;
+search queries go through the same tokenizer so that both sides agree on
+terms.
+"""
+
+import re
+import math
+from collections import Counter
+from typing import Dict, Iterable, List
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by for from has have he her his i if in into is
+it its me my no not of on or our she so that the their them there they this to
+was we were will with you your
+""".split())
+
+# Longest token kept, and most terms indexed per record
+MAX_TOKEN_LENGTH = 40
+MAX_TERMS_PER_RECORD = 200
+# Extra weight for terms that appear in the detected scam phrases
+PHRASE_BOOST = 2.0
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens of ``text`` without stopwords or one-letter words."""
+    return [
+        token for token in TOKEN_PATTERN.findall((text or "").lower())
+        if 1 < len(token) <= MAX_TOKEN_LENGTH and token not in STOPWORDS
+    ]
+
+
+def term_weights(extracted_text: str, scam_phrases: Iterable[str]) -> Dict[str, float]:
+    """
+    Weight of every term of one record, for ranking search results.
+
+    Term frequency is damped logarithmically and terms from the scam phrases
+    are boosted, since they are what analysts usually search for.
+
+    Args:
+        extracted_text: OCR text of the image
+        scam_phrases: Phrases flagged by the detector
+
+    Returns:
+        Mapping of term to weight, at most ``MAX_TERMS_PER_RECORD`` terms
+    """
+    phrase_terms = set(tokenize(" ".join(scam_phrases or [])))
+    counts = Counter(tokenize(extracted_text))
+    for term in phrase_terms:
+        counts[term] += 1
+
+    weights = {
+        term: round(1 + math.log(count) + (PHRASE_BOOST if term in phrase_terms else 0), 3)
+        for term, count in counts.items()
+    }
+    if len(weights) > MAX_TERMS_PER_RECORD:
+        weights = dict(sorted(weights.items(), key=lambda item: -item[1])[:MAX_TERMS_PER_RECORD])
+    return weights
+
+
+def idf(document_count: int, term_document_count: int) -> float:
+    """Inverse document frequency of a term."""
+    return math.log(1 + document_count / max(1, term_document_count))
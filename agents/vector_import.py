@@ -0,0 +1,132 @@
+"""
+Bulk import of known scam samples into the vector store.
+
+Streams a JSONL or CSV corpus, embeds batches in parallel and writes them in
+file order, recording a checkpoint after every written batch so an
+interrupted import resumes where it stopped. Document ids are derived from
+the text, so re-importing rows is an idempotent upsert.
+"""
+
+import os
+import csv
+import json
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+from agents.vectorstore import embed_texts, write_embedded
+
+logger = logging.getLogger(__name__)
+
+# Metadata value types Chroma accepts
+METADATA_TYPES = (str, int, float, bool)
+
+
+def read_corpus(path: str, text_field: str = "text") -> Iterator[Tuple[str, Dict]]:
+    """
+    Stream (text, metadata) pairs from a ``.jsonl`` or ``.csv`` file.
+
+    Every other scalar column becomes metadata; rows without text are
+    yielded with an empty text so row numbers stay stable for checkpoints.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) if line.strip() else {} for line in f)
+        for row in rows:
+            text = str(row.get(text_field) or "").strip()
+            metadata = {
+                key: value for key, value in row.items()
+                if key != text_field and isinstance(value, METADATA_TYPES) and value != ""
+            }
+            yield text, metadata
+
+
+def _load_checkpoint(checkpoint_path: str, path: str) -> int:
+    """Rows of ``path`` already imported according to the checkpoint file."""
+    if not os.path.exists(checkpoint_path):
+        return 0
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("path") != os.path.abspath(path):
+        raise ValueError(f"Checkpoint {checkpoint_path} belongs to {checkpoint.get('path')}")
+    return checkpoint["rows"]
+
+
+def _save_checkpoint(checkpoint_path: str, path: str, rows: int):
+    """Atomically record that the first ``rows`` rows are imported."""
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"path": os.path.abspath(path), "rows": rows}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def _embed_batch(batch: List[Tuple[str, Dict]]) -> Tuple[List[str], List[List[float]], List[Dict]]:
+    texts = [text for text, _ in batch if text]
+    metadatas = [metadata or {"source": "import"} for text, metadata in batch if text]
+    return texts, (embed_texts(texts) if texts else []), metadatas
+
+
+def bulk_import(
+    path: str,
+    collection,
+    text_field: str = "text",
+    batch_size: int = 256,
+    workers: int = 4,
+    checkpoint_path: Optional[str] = None,
+) -> int:
+    """
+    Import a corpus into a collection.
+
+    Args:
+        path: ``.jsonl`` or ``.csv`` corpus
+        collection: Target Chroma collection
+        text_field: Column holding the text to embed
+        batch_size: Texts per embedding request
+        workers: Embedding requests in flight at once
+        checkpoint_path: Progress file (default ``<path>.checkpoint``)
+
+    Returns:
+        Number of rows imported by this run
+    """
+    checkpoint_path = checkpoint_path or f"{path}.checkpoint"
+    done = _load_checkpoint(checkpoint_path, path)
+    if done:
+        logger.info(f"Resuming {path} after {done} rows")
+
+    def batches():
+        batch = []
+        for row_number, row in enumerate(read_corpus(path, text_field)):
+            if row_number < done:
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    imported = 0
+    in_flight = deque()
+
+    def write_oldest():
+        nonlocal imported
+        rows, future = in_flight.popleft()
+        texts, vectors, metadatas = future.result()
+        if texts:
+            write_embedded(collection, texts, vectors, metadatas)
+        imported += rows
+        _save_checkpoint(checkpoint_path, path, done + imported)
+        logger.info(f"Imported {done + imported} rows of {path}")
+
+    # Batches are embedded concurrently but written and checkpointed in file
+    # order, so the checkpoint never skips an unwritten batch
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in batches():
+            in_flight.append((len(batch), pool.submit(_embed_batch, batch)))
+            if len(in_flight) >= workers * 2:
+                write_oldest()
+        while in_flight:
+            write_oldest()
+    return imported
@@ -1,10 +1,227 @@
-from langchain_openai import OpenAIEmbeddings
-from langchain.vectorstores import Chroma
+import atexit
+import hashlib
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from agents.clients import get_embeddings
+from agents.embedding_cache import cached_embeddings
+from agents.rate_limit import get_rate_limiter, estimate_tokens
+
+if TYPE_CHECKING:
+    import chromadb
+    from chromadb.api.models.Collection import Collection
+
+logger = logging.getLogger(__name__)
+
+PERSIST_DIRECTORY = "meme_db"
+EMBEDDING_MODEL = "text-embedding-3-large"
+# LangChain's default collection name, which the meme DB was created under
+MEME_COLLECTION = "langchain"
+
+_embeddings = None
+_client: Optional["chromadb.ClientAPI"] = None
+_meme_writer = None
+_collections: Dict[str, "Collection"] = {}
+_collections_lock = threading.Lock()
+
+
+def get_embeddings_client():
+    """Embeddings client shared by ingestion and similarity queries, so each distinct text is embedded once."""
+    global _embeddings
+    with _collections_lock:
+        if _embeddings is None:
+            _embeddings = cached_embeddings(get_embeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL)
+        return _embeddings
+
+
+def _open_collection(name: str, metadata: Optional[Dict] = None) -> "Collection":
+    """Open or create a collection of the persistent DB, once per process."""
+    global _client
+    with _collections_lock:
+        if name not in _collections:
+            if _client is None:
+                import chromadb
+
+                _client = chromadb.PersistentClient(path=PERSIST_DIRECTORY)
+            # Vectors always come from embed_texts, so Chroma never embeds itself
+            _collections[name] = _client.get_or_create_collection(name, metadata=metadata, embedding_function=None)
+        return _collections[name]
+
+
+def get_db() -> "Collection":
+    """The default meme DB collection, opened on first use."""
+    return _open_collection(MEME_COLLECTION)
+
+
+def get_collection(name: str, index_params: Optional[Dict] = None) -> "Collection":
+    """
+    Shared Chroma collection ``name`` in the meme DB, compared by cosine similarity.
+
+    Args:
+        name: Collection name
+        index_params: Extra HNSW settings (e.g. ``hnsw:M``); Chroma only
+            applies them when the collection is first created
+
+    Returns:
+        The chromadb collection; writes are persisted as they are made
+    """
+    return _open_collection(name, {"hnsw:space": "cosine", **(index_params or {})})
+
+
+def text_id(text: str) -> str:
+    """Deterministic document id, so writing the same text twice is an upsert."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """Embed a batch of texts in one rate-limited request."""
+    return get_rate_limiter("openai").call(
+        get_embeddings_client().embed_documents, texts, tokens=estimate_tokens(*texts)
+    )
+
+
+def write_embedded(collection: "Collection", texts: List[str], vectors: List[List[float]],
+                   metadatas: Optional[List[Dict]] = None):
+    """Upsert already-embedded texts into a collection."""
+    # Chroma rejects duplicate ids within one call; the last copy wins
+    rows = {text_id(text): i for i, text in enumerate(texts)}
+    collection.upsert(
+        ids=list(rows),
+        embeddings=[vectors[i] for i in rows.values()],
+        documents=[texts[i] for i in rows.values()],
+        metadatas=[metadatas[i] for i in rows.values()] if metadatas else None,
+    )
+
+
+def search_embedded(collection: "Collection", vector: List[float], k: int,
+                    where: Optional[Dict] = None) -> List[Tuple[str, Dict, float]]:
+    """
+    Nearest neighbours of an already-embedded query.
+
+    Args:
+        collection: Collection created by ``get_collection`` (cosine space)
+        vector: Query embedding, e.g. from ``embed_texts``
+        k: Number of results
+        where: Optional metadata filter
+
+    Returns:
+        (document, metadata, cosine similarity) tuples, most similar first
+    """
+    result = collection.query(
+        query_embeddings=[vector], n_results=k, where=where,
+        include=["documents", "metadatas", "distances"],
+    )
+    return [
+        (document, metadata or {}, 1.0 - distance)
+        for document, metadata, distance in zip(
+            result["documents"][0], result["metadatas"][0], result["distances"][0]
+        )
+    ]
+
+
+class BufferedVectorWriter:
+    """
+    Batches writes to a collection.
+
+    Texts are buffered and embedded in one request per batch; the batch is
+    written once the buffer reaches ``batch_size`` texts or its oldest text
+    has waited ``flush_interval`` seconds. A batch that
+    fails is put back in the buffer and retried up to ``max_retries`` times.
+    """
+
+    def __init__(self, collection: "Collection", batch_size: int = 64, flush_interval: float = 5.0,
+                 max_retries: int = 3):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._texts: List[str] = []
+        self._metadatas: List[Dict] = []
+        self._failed_flushes = 0
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def add(self, text: str, metadata: Optional[Dict] = None):
+        """Buffer one text for writing."""
+        with self._lock:
+            self._texts.append(text)
+            self._metadatas.append({"added_at": time.time(), **(metadata or {})})
+            full = len(self._texts) >= self.batch_size
+            if not full:
+                self._schedule()
+        if full:
+            self.flush()
+
+    def _schedule(self):
+        """Start the flush timer if it is not running; call with the lock held."""
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> bool:
+        """
+        Embed and write everything buffered.
+
+        Returns:
+            False if the write failed; the texts stay buffered for a retry
+            unless they have used up ``max_retries``
+        """
+        with self._lock:
+            texts, metadatas = self._texts, self._metadatas
+            self._texts, self._metadatas = [], []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not texts:
+            return True
+
+        started = time.monotonic()
+        try:
+            write_embedded(self.collection, texts, embed_texts(texts), metadatas)
+        except Exception as e:
+            with self._lock:
+                self._failed_flushes += 1
+                if self._failed_flushes > self.max_retries:
+                    self._failed_flushes = 0
+                    logger.error(f"Dropped {len(texts)} texts after {self.max_retries + 1} failed "
+                                 f"vector store writes: {str(e)}")
+                else:
+                    self._texts = texts + self._texts
+                    self._metadatas = metadatas + self._metadatas
+                    self._schedule()
+                    logger.warning(f"Vector store flush of {len(texts)} texts failed, will retry: {str(e)}")
+            return False
+
+        with self._lock:
+            self._failed_flushes = 0
+        logger.info(f"Wrote {len(texts)} texts to the vector store in {time.monotonic() - started:.2f}s")
+        return True
+
+    def close(self):
+        """Flush at exit, reporting texts that could not be written."""
+        if not self.flush():
+            with self._lock:
+                lost = len(self._texts)
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if lost:
+                logger.error(f"Exiting with {lost} texts not written to the vector store")
+
+
+def get_meme_writer() -> BufferedVectorWriter:
+    """Writer of the meme DB, flushed when the process exits."""
+    global _meme_writer
+    db = get_db()
+    with _collections_lock:
+        if _meme_writer is None:
+            _meme_writer = BufferedVectorWriter(db)
+            atexit.register(_meme_writer.close)
+        return _meme_writer
 
-embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
-db = Chroma(persist_directory="meme_db", embedding_function=embeddings)
 
 def store_meme(text_entry: str):
-    db.add_texts([text_entry])
-    db.persist()
-    return "✅ Meme stored in vector DB"
+    get_meme_writer().add(text_entry)
+    return "✅ Meme queued for the vector DB"
@@ -1,18 +1,17 @@
 import streamlit as st
-from PIL import Image
 import io
 import base64
 import tempfile
 import os
 import json
 import redis
-import hashlib
 from dotenv import load_dotenv
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
-from agents.llm_utils import generate_narration_from_json, what_if_bot
-from agents.image_utils import generate_starter_frame
-from agents.detect_scam import detect_scam_text, ocr_with_openai
+from agents.pipeline import build_analysis_pipeline
+from agents.result_cache import ResultCache, content_hash
+from agents.job_queue import JobQueue
+from agents.history_store import HistoryStore, facet_values
+from agents import similar_scams
 import urllib.parse
 
 load_dotenv()
@@ -20,7 +19,7 @@ load_dotenv()
 # -----------------------------
 @st.cache_resource
 
-def init_redis():
+def init_redis(decode_responses=True):
     try:
         REDIS_HOST = os.getenv("REDIS_HOST")
         REDIS_PORT = int(os.getenv("REDIS_PORT"))  # ⚠ Convert to int!
@@ -30,7 +29,7 @@ def init_redis():
             host=REDIS_HOST,
             port=REDIS_PORT,
             password=REDIS_PASSWORD,
-            decode_responses=True
+            decode_responses=decode_responses
         )
         r.ping()
         return r
@@ -39,6 +38,11 @@ def init_redis():
         return None
 
 redis_client = init_redis()
+# Binary-safe connection so history images are stored as raw bytes
+redis_blob_client = init_redis(decode_responses=False) if redis_client else None
+result_cache = ResultCache(redis_client, redis_blob_client)
+# Hand analyses to worker.py processes instead of running them in the script thread
+job_queue = JobQueue(redis_client) if redis_client and os.getenv("ANALYSIS_BACKEND", "inline") == "queue" else None
 
 # -----------------------------
 # Page Configuration
@@ -600,9 +604,50 @@ import redis
 import json
 import base64
 import io
-from PIL import Image
 from datetime import datetime
 
+SIMILAR_SCOPES = {
+    "Any": None,
+    "Same scam type": "scam_type",
+    "Same category": "category",
+    "Same risk level": "risk_level",
+}
+
+
+def show_similar_scams(text, analysis, key, exclude_id=None, on_open=None):
+    """Show the saved analyses most similar to an analysis"""
+    st.markdown("#### 🧬 Similar Past Scams")
+    scope = st.selectbox("Match", list(SIMILAR_SCOPES), key=f"{key}_scope", label_visibility="collapsed")
+    field = SIMILAR_SCOPES[scope]
+    value = facet_values(analysis).get(field) if field else None
+    filters = {field: value} if value else None
+
+    try:
+        matches = similar_scams.find_similar(
+            text or similar_scams.document_text(analysis), k=5, filters=filters, exclude_id=exclude_id
+        )
+    except Exception as e:
+        st.warning(f"Similar scam lookup unavailable: {str(e)}")
+        return
+    if not matches:
+        st.info("No similar past scams found")
+        return
+
+    for match in matches:
+        saved_at = datetime.fromtimestamp(match['timestamp']).strftime("%b %d, %Y")
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            st.markdown(
+                f"**{match.get('scam_type', 'Unknown')}** · {match.get('risk_level', 'Unknown')} risk · "
+                f"{saved_at} · {match['similarity'] * 100:.0f}% similar"
+            )
+            st.caption(match['text'][:160])
+        if on_open:
+            with col2:
+                if st.button("Open", key=f"{key}_open_{match['analysis_id']}"):
+                    on_open(match['analysis_id'])
+
+
 def show_history_page():
     @st.cache_resource
     def init_redis():
@@ -624,11 +669,25 @@ def show_history_page():
             return None
 
     redis_client = init_redis()
+    history_store = HistoryStore(redis_client, redis_blob_client) if redis_client and redis_blob_client else None
 
     # Initialize session state for selected item
     if 'selected_history_item' not in st.session_state:
         st.session_state.selected_history_item = None
 
+    # Current page of the history grid
+    HISTORY_PAGE_SIZE = 12
+    if 'history_page' not in st.session_state:
+        st.session_state.history_page = 0
+
+    # Active feed filters: risk_level / scam_type / category -> value
+    if 'history_filters' not in st.session_state:
+        st.session_state.history_filters = {}
+
+    # Active full-text search query
+    if 'history_query' not in st.session_state:
+        st.session_state.history_query = ""
+
     # Page configuration
     st.set_page_config(
         page_title="TruthLoop - Analysis History", 
@@ -889,38 +948,90 @@ def show_history_page():
     </div>
     """, unsafe_allow_html=True)
 
-    def load_history():
-        """Load analysis history from Redis"""
-        if not redis_client:
-            return []
+    def load_history(page=0, page_size=HISTORY_PAGE_SIZE, filters=None, query=""):
+        """Load one page of analysis history (or search results) from Redis, returning (items, total count)"""
+        if not history_store:
+            return [], 0
         
         try:
-            # Get all history IDs sorted by timestamp (newest first)
-            history_ids = redis_client.zrevrange("history_index", 0, -1)
-            
-            history_items = []
-            for history_id in history_ids:
-                data = redis_client.hgetall(f"history:{history_id}")
-                if data:
-                    # Parse the stored analysis
-                    try:
-                        analysis = json.loads(data.get('analysis', '{}'))
-                        data['analysis'] = analysis
-                        
-                        # Ensure required fields exist with defaults
-                        data.setdefault('id', history_id)
-                        data.setdefault('risk_level', analysis.get('risk_level', 'Unknown'))
-                        data.setdefault('threat_count', len(analysis.get('scam_phrases', [])))
-                        data.setdefault('timestamp', datetime.now().isoformat())
-                        
-                        history_items.append(data)
-                    except json.JSONDecodeError:
-                        continue
-            
-            return history_items
+            if query:
+                return history_store.search(query, page, page_size, filters)
+            return history_store.load_page(page, page_size, filters)
         except Exception as e:
             st.error(f"Failed to load history: {str(e)}")
-            return []
+            return [], 0
+
+    def load_stats():
+        """Load the feed statistics from Redis (O(1), independent of history size)"""
+        if not history_store:
+            return None
+        
+        try:
+            return history_store.get_stats()
+        except Exception as e:
+            st.warning(f"Failed to load statistics: {str(e)}")
+            return None
+
+    def display_search():
+        """Display the full-text search box over extracted text and threat phrases"""
+        query = st.text_input(
+            "🔍 Search analyses",
+            key="history_search",
+            placeholder="e.g. gift card, parcel delivery, bank account"
+        ).strip()
+        
+        # A new query starts again from the best match
+        if query != st.session_state.history_query:
+            st.session_state.history_query = query
+            st.session_state.history_page = 0
+            st.rerun()
+
+    def display_filters():
+        """Display filter controls backed by the server-side history indexes"""
+        labels = {'risk_level': "🚨 Risk Level", 'scam_type': "🕵️ Scam Type", 'category': "📂 Category"}
+        filters = {}
+        
+        cols = st.columns(len(labels))
+        for col, (field, label) in zip(cols, labels.items()):
+            with col:
+                try:
+                    options = [value for value, _ in history_store.get_facet_values(field)]
+                except Exception as e:
+                    st.warning(f"Failed to load filters: {str(e)}")
+                    options = []
+                current = st.session_state.history_filters.get(field)
+                if current and current not in options:
+                    options.insert(0, current)
+                choice = st.selectbox(label, ["All"] + options, key=f"history_filter_{field}")
+                if choice != "All":
+                    filters[field] = choice
+        
+        # Changing a filter starts again from the newest matching analysis
+        if filters != st.session_state.history_filters:
+            st.session_state.history_filters = filters
+            st.session_state.history_page = 0
+            st.rerun()
+
+    def display_pagination(total):
+        """Display previous/next controls for the history grid"""
+        page_count = max(1, -(-total // HISTORY_PAGE_SIZE))
+        page = min(st.session_state.history_page, page_count - 1)
+        
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("⬅️ Newer", key="history_prev", disabled=page == 0, use_container_width=True):
+                st.session_state.history_page = page - 1
+                st.rerun()
+        with col2:
+            st.markdown(f"""
+            <div style="text-align: center; color: var(--text-muted); padding-top: 0.5rem;">
+                Page {page + 1} of {page_count}
+            </div>
+            """, unsafe_allow_html=True)
+        with col3:
+            if st.button("Older ➡️", key="history_next", disabled=page >= page_count - 1, use_container_width=True):
+                st.session_state.history_page = page + 1
+                st.rerun()
 
     def show_analysis_detail(item):
         """Show detailed analysis"""
@@ -955,11 +1066,16 @@ def show_history_page():
         
         st.markdown("---")
         
-        # Display image
+        # Display image (fetched only when the detail view is opened)
         try:
-            image_data = base64.b64decode(item.get('image_data', ''))
-            image = Image.open(io.BytesIO(image_data))
-            st.image(image, caption="Original Image", use_container_width=True)
+            image_data = history_store.get_image(item['id'])
+            if image_data:
+                from PIL import Image
+
+                image = Image.open(io.BytesIO(image_data))
+                st.image(image, caption="Original Image", use_container_width=True)
+            else:
+                st.warning("Original image is no longer available")
         except Exception as e:
             st.error(f"Failed to load image: {str(e)}")
         
@@ -972,15 +1088,36 @@ def show_history_page():
         else:
             st.info("✅ No threat phrases detected")
         
+        # Display the OCR text stored with the record
+        try:
+            extracted_text = history_store.get_extracted_text(item['id'])
+        except Exception:
+            extracted_text = ""
+        if extracted_text:
+            with st.expander("📝 Extracted Text"):
+                st.text(extracted_text)
+        
         # Display reasoning if available
         if 'reasoning' in analysis:
             st.markdown("#### 💭 Analysis Reasoning:")
             st.markdown(analysis['reasoning'])
         
+        # Display saved analyses like this one
+        show_similar_scams(extracted_text, analysis, key="detail_similar",
+                           exclude_id=item['id'], on_open=open_history_item)
+        
         # Display full analysis
         with st.expander("🔍 View Complete Analysis Data"):
             st.json(analysis)
 
+    def open_history_item(history_id):
+        """Switch the detail view to another saved analysis"""
+        items = history_store.get_items([history_id])
+        if items:
+            st.session_state.selected_history_item = items[0]
+            st.rerun()
+        st.warning("That analysis is no longer available")
+
     def display_history_grid(history_items):
         """Display history items in a grid layout"""
         if not history_items:
@@ -1013,21 +1150,18 @@ def show_history_page():
                 risk_level = item.get('risk_level', 'Unknown')
                 risk_class = f"risk-{risk_level.lower()}"
                 
-                # Decode and display thumbnail
+                # Display card (precomputed thumbnail; the full image loads in the detail view)
                 try:
-                    image_data = base64.b64decode(item.get('image_data', ''))
-                    image = Image.open(io.BytesIO(image_data))
-                    
                     # Create a unique key for each item
                     button_key = f"history_item_{item['id']}"
                     
+                    if item.get('thumbnail'):
+                        st.image(item['thumbnail'], use_container_width=True)
+                    
                     if st.button(f"📊 Analysis from {date_str}", key=button_key, use_container_width=True):
                         st.session_state.selected_history_item = item
                         st.rerun()
                     
-                    # Display thumbnail
-                    st.image(image, use_container_width=True)
-                    
                     # Display metadata
                     threat_count = item.get('threat_count', 0)
                     st.markdown(f"""
@@ -1052,7 +1186,6 @@ def show_history_page():
                         scam_type = analysis_data.get('scam_type', 'Unknown')
                         category = analysis_data.get('category', 'Unknown')
                         reasoning = analysis_data.get('reasoning', '')
-                        image_data = base64.b64decode(item.get('image_data', ''))
 
 
                         if extracted_text:
@@ -1139,30 +1272,42 @@ def show_history_page():
         if st.session_state.selected_history_item:
             show_analysis_detail(st.session_state.selected_history_item)
         else:
-            # Load and display history
-            history_items = load_history()
-            
-            # Display statistics
-            if history_items:
-                total_analyses = len(history_items)
-                high_risk_count = sum(1 for item in history_items if item.get('risk_level') == 'High')
-                avg_confidence = sum(
-                    item['analysis'].get('confidence', item['analysis'].get('confidence_score', 0))
-                    for item in history_items
-                ) / len(history_items)
- 
+            # Load and display the current page of history
+            history_items, total_analyses = load_history(
+                st.session_state.history_page,
+                filters=st.session_state.history_filters,
+                query=st.session_state.history_query
+            )
+            
+            # Page no longer exists (e.g. records expired); jump back to the first page
+            if not history_items and st.session_state.history_page > 0:
+                st.session_state.history_page = 0
+                st.rerun()
+            
+            # Display statistics (running totals maintained on save and expiry)
+            stats = load_stats()
+            if stats and stats['total']:
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("📊 Total Analyses", total_analyses)
+                    st.metric("📊 Total Analyses", stats['total'])
                 with col2:
-                    st.metric("🚨 High Risk Detected", high_risk_count)
+                    st.metric("🚨 High Risk Detected", stats['high_risk'])
                 with col3:
-                    st.metric("📈 Average Confidence", f"{avg_confidence:.1f}%")
+                    st.metric("📈 Average Confidence", f"{stats['avg_confidence']:.1f}%")
                 
                 st.markdown("---")
+                display_search()
+                display_filters()
             
             # Display history grid
-            display_history_grid(history_items)
+            if not history_items and st.session_state.history_query:
+                st.info(f"No analyses match \"{st.session_state.history_query}\".")
+            elif not history_items and st.session_state.history_filters:
+                st.info("No analyses match these filters.")
+            else:
+                display_history_grid(history_items)
+            if total_analyses > HISTORY_PAGE_SIZE:
+                display_pagination(total_analyses)
         
     else:
         st.markdown("""
@@ -1742,37 +1887,19 @@ def show_home_page():
 
 
         # Helper function to save analysis to Redis
-        def save_to_history(analysis_data, image_data, redis_client):
-            if not redis_client:
-                return False
+        def save_to_history(analysis_data, image_data, redis_client, extracted_text=""):
+            """Save an analysis to the feed and return its id (None on failure)"""
+            if not redis_client or not redis_blob_client:
+                return None
             try:
-                # Create unique ID based on timestamp and content hash
-                timestamp = datetime.now().isoformat()
-                content_hash = hashlib.md5(json.dumps(analysis_data, sort_keys=True).encode()).hexdigest()[:8]
-                analysis_id = f"analysis_{timestamp}_{content_hash}"
-                
-                # Prepare data for storage
-                storage_data = {
-                    'id': analysis_id,
-                    'timestamp': timestamp,
-                    'analysis': json.dumps(analysis_data),
-                    'image_data': base64.b64encode(image_data).decode('utf-8'),
-                    'risk_level': analysis_data.get('risk_level', 'Unknown'),
-                    'threat_count': len(analysis_data.get('scam_phrases', []))
-                }
-                
-                # Save to Redis with expiration (30 days)
-                redis_client.hset(f"history:{analysis_id}", mapping=storage_data)
-                redis_client.expire(f"history:{analysis_id}", 30 * 24 * 60 * 60)  # 30 days
-                
-                # Add to index
-                redis_client.zadd("history_index", {analysis_id: datetime.now().timestamp()})
-                
-                return True
+                # Record, expiry and indexes are written in one transaction (30 day expiry)
+                analysis_id = HistoryStore(redis_client, redis_blob_client).save(analysis_data, image_data, extracted_text)
+                similar_scams.index_analysis(analysis_id, analysis_data, extracted_text)
+                return analysis_id
             
             except Exception as e:
                 st.error(f"Failed to save to history: {str(e)}")
-                return False
+                return None
 
         # -----------------------------
         # Header Section
@@ -1795,7 +1922,7 @@ def show_home_page():
             st.markdown('</div>', unsafe_allow_html=True)
 
             # Read file once
-            file_bytes = uploaded_home.read()
+            file_bytes = uploaded_home.getvalue()
 
             # Save uploaded image temporarily
             temp_input = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
@@ -1808,42 +1935,8 @@ def show_home_page():
             status_text = st.empty()
 
             # -----------------------------
-            # OCR + Scam Detection
+            # Results layout (placeholders fill in as each stage finishes)
             # -----------------------------
-            status_text.text("🔍 Extracting text from image...")
-            progress_bar.progress(20)
-            
-            extracted_text = ocr_with_openai(file_bytes)
-            
-            status_text.text("🚨 Analyzing for threat indicators...")
-            progress_bar.progress(40)
-            
-            scam_json = detect_scam_text(extracted_text)
-            scam_phrases = scam_json.get("scam_phrases", [])
-            risk_level = scam_json.get("risk_level", "Low")
-            confidence = scam_json.get("confidence", 0)
-
-            status_text.text("📚 Generating educational content...")
-            progress_bar.progress(60)
-            
-            img_base64 = base64.b64encode(file_bytes).decode("utf-8")
-
-            with ThreadPoolExecutor(max_workers=3) as executor:
-                future_narration = executor.submit(generate_narration_from_json, scam_json)
-                future_image = executor.submit(generate_starter_frame, extracted_text)
-                narration = future_narration.result()
-
-                future_what_if = executor.submit(what_if_bot,narration)
-                edu_image_path = future_image.result()
-                what_if_scenario = future_what_if.result()
-
-            progress_bar.progress(100)
-            
-            # Clear processing indicators
-            status_text.empty()
-            progress_bar.empty()
-
-            # Display threat detection results
             st.markdown("""
             <div class="results-container">
                 <div class="step-indicator">
@@ -1852,58 +1945,90 @@ def show_home_page():
                 </div>
             </div>
             """, unsafe_allow_html=True)
-            
-            # Create threat-specific metrics
-            col1, col2, col3 = st.columns(3)
-            
-            risk_class = f"{risk_level.lower()}-risk"
-            risk_colors = {
-                "High": "#f85149",
-                "Medium": "#f0883e", 
-                "Low": "#56d364"
-            }
-            
-            with col1:
-                st.markdown(f"""
-                <div class="threat-metrics">
-                    <div class="metric-container">
-                        <div class="metric-value">{len(scam_phrases)}</div>
-                        <div class="metric-label">Threat Phrases Detected</div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col2:
-                st.markdown(f"""
-                <div class="threat-metrics">
-                    <div class="metric-container">
-                        <div class="metric-value {risk_class}" style="color: {risk_colors.get(risk_level, '#56d364')} !important;">{risk_level}</div>
-                        <div class="metric-label">Risk Level</div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col3:
-                st.markdown(f"""
-                <div class="threat-metrics">
-                    <div class="metric-container">
-                        <div class="metric-value">{confidence}%</div>
-                        <div class="metric-label">Confidence Score</div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+            metrics_slot = st.empty()
+            extracted_text_slot = st.empty()
+            detail_slot = st.empty()
 
-            # Display extracted text with highlighted threat phrases
-            if extracted_text:
-                st.markdown("""
-                <div class="results-container">
-                    <div class="step-indicator">
-                        <div class="step-number">📝</div>
-                        <div class="step-title">Extracted Text with Threat Highlighting</div>
-                    </div>
+            st.markdown("""
+            <div class="results-container">
+                <div class="step-indicator">
+                    <div class="step-number">2</div>
+                    <div class="step-title">🎓 Educational Resources</div>
                 </div>
-                """, unsafe_allow_html=True)
-                
+            </div>
+            """, unsafe_allow_html=True)
+
+            # Tabbed interface for educational content
+            tab1,tab2,tab3= st.tabs(["📖 Educational Explanation","❗Consequnces", "🎨 Visual Learning Guide"])
+            with tab1:
+                narration_slot = st.empty()
+                narration_slot.info("⏳ Preparing educational explanation...")
+            with tab2:
+                what_if_slot = st.empty()
+                what_if_slot.info("⏳ Preparing consequences scenario...")
+            with tab3:
+                visual_slot = st.empty()
+                visual_slot.info("⏳ Rendering visual learning guide...")
+
+            def render_threat_metrics(scam_json):
+                scam_phrases = scam_json.get("scam_phrases", [])
+                risk_level = scam_json.get("risk_level", "Low")
+                confidence = scam_json.get("confidence")
+                # Streamed partial results may not carry every field yet
+                phrase_count = len(scam_phrases) if isinstance(scam_phrases, list) else 0
+                confidence_display = f"{confidence}%" if confidence is not None else "…"
+
+                risk_class = f"{risk_level.lower()}-risk"
+                risk_colors = {
+                    "High": "#f85149",
+                    "Medium": "#f0883e", 
+                    "Low": "#56d364"
+                }
+
+                with metrics_slot.container():
+                    # Create threat-specific metrics
+                    col1, col2, col3 = st.columns(3)
+
+                    with col1:
+                        st.markdown(f"""
+                        <div class="threat-metrics">
+                            <div class="metric-container">
+                                <div class="metric-value">{phrase_count}</div>
+                                <div class="metric-label">Threat Phrases Detected</div>
+                            </div>
+                        </div>
+                        """, unsafe_allow_html=True)
+                    
+                    with col2:
+                        st.markdown(f"""
+                        <div class="threat-metrics">
+                            <div class="metric-container">
+                                <div class="metric-value {risk_class}" style="color: {risk_colors.get(risk_level, '#56d364')} !important;">{risk_level}</div>
+                                <div class="metric-label">Risk Level</div>
+                            </div>
+                        </div>
+                        """, unsafe_allow_html=True)
+                    
+                    with col3:
+                        st.markdown(f"""
+                        <div class="threat-metrics">
+                            <div class="metric-container">
+                                <div class="metric-value">{confidence_display}</div>
+                                <div class="metric-label">Confidence Score</div>
+                            </div>
+                        </div>
+                        """, unsafe_allow_html=True)
+
+                # Expandable detailed analysis
+                with detail_slot.container():
+                    with st.expander("🔍 View Detailed Threat Analysis", expanded=False):
+                        st.json(scam_json)
+
+            def render_extracted_text(extracted_text, scam_phrases):
+                # Display extracted text with highlighted threat phrases
+                if not extracted_text:
+                    return
+
                 # Highlight threat phrases in the extracted text
                 highlighted_text = extracted_text
                 for phrase in scam_phrases:
@@ -1912,8 +2037,14 @@ def show_home_page():
                         import re
                         pattern = re.compile(re.escape(phrase), re.IGNORECASE)
                         highlighted_text = pattern.sub(f'<span class="threat-phrase">{phrase}</span>', highlighted_text)
-                
-                st.markdown(f"""
+
+                extracted_text_slot.markdown(f"""
+                <div class="results-container">
+                    <div class="step-indicator">
+                        <div class="step-number">📝</div>
+                        <div class="step-title">Extracted Text with Threat Highlighting</div>
+                    </div>
+                </div>
                 <div class="content-card" style="padding: 1.5rem; margin: 1rem 0; background: var(--bg-secondary); border-radius: 12px; border: 1px solid var(--border-primary);">
                     <div style="color: var(--text-secondary); font-family: 'Courier New', monospace; line-height: 1.6; font-size: 1rem;">
                         {highlighted_text.replace(chr(10), '<br>')}
@@ -1921,43 +2052,128 @@ def show_home_page():
                 </div>
                 """, unsafe_allow_html=True)
 
-            # Expandable detailed analysis
-            with st.expander("🔍 View Detailed Threat Analysis", expanded=False):
-                st.json(scam_json)
-
-            # -----------------------------
-            # Educational Content Display
-            # -----------------------------
-            st.markdown("""
-            <div class="results-container">
-                <div class="step-indicator">
-                    <div class="step-number">2</div>
-                    <div class="step-title">🎓 Educational Resources</div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-
-            # Tabbed interface for educational content
-            tab1,tab2,tab3= st.tabs(["📖 Educational Explanation","❗Consequnces", "🎨 Visual Learning Guide"])
-            
-            with tab1:
-                st.markdown(f"""
+            def render_narration(narration):
+                narration_slot.markdown(f"""
                 <div class="educational-content">
                     <h4>🎓 Understanding the Threats</h4>
                     <p>{narration}</p>
                 </div>
                 """, unsafe_allow_html=True)
 
-            with tab2:
-                st.markdown(f"""
+            def render_what_if(what_if_scenario):
+                what_if_slot.markdown(f"""
                 <div class="whatif-content">
                     <h4>❗Consequnces</h4>
                     <p>{what_if_scenario}</p>
                 </div>
                 """, unsafe_allow_html=True)
 
-            with tab3:
-                st.image(Image.open(edu_image_path), caption="🎨 Educational Visual Guide", use_container_width=True)
+            def render_visual_guide(frame_bytes):
+                from PIL import Image
+
+                visual_slot.image(Image.open(io.BytesIO(frame_bytes)), caption="🎨 Educational Visual Guide", use_container_width=True)
+
+            # -----------------------------
+            # Session memo (widget reruns reuse the finished analysis)
+            # -----------------------------
+            upload_key = getattr(uploaded_home, "file_id", None) or f"{uploaded_home.name}:{uploaded_home.size}"
+            session_analysis = st.session_state.get("home_analysis")
+
+            rendered_progressively = False
+
+            if session_analysis and session_analysis["upload_key"] == upload_key:
+                analysis_result = session_analysis["result"]
+            else:
+                # -----------------------------
+                # Result cache lookup (same screenshot analysed before)
+                # -----------------------------
+                upload_digest = content_hash(file_bytes)
+                analysis_result = result_cache.get(upload_digest)
+
+                if not analysis_result:
+                    # -----------------------------
+                    # OCR → detection → educational content, scheduled by dependency
+                    # -----------------------------
+                    stage_messages = {
+                        "extracted_text": "🚨 Analyzing for threat indicators...",
+                        "scam_json": "📚 Generating educational content...",
+                        "narration": "📚 Generating educational content...",
+                        "what_if_scenario": "🎨 Finishing visual learning guide...",
+                        "frame_bytes": "📚 Finishing educational content...",
+                    }
+                    analysis_result = {}
+
+                    def on_stage_complete(stage_name, output):
+                        # Intermediate stages (e.g. the combined vision call) have nothing to render
+                        if stage_name not in stage_messages:
+                            return
+
+                        # Render each section as soon as its stage has finished
+                        if stage_name == "extracted_text":
+                            analysis_result["extracted_text"] = output
+                            render_extracted_text(output, [])
+                        elif stage_name == "scam_json":
+                            analysis_result["scam_json"] = output
+                            render_threat_metrics(output)
+                            render_extracted_text(analysis_result.get("extracted_text", ""), output.get("scam_phrases", []))
+                        elif stage_name == "narration":
+                            analysis_result["narration"] = output.strip()
+                            render_narration(analysis_result["narration"])
+                        elif stage_name == "what_if_scenario":
+                            analysis_result["what_if_scenario"] = output.strip()
+                            render_what_if(analysis_result["what_if_scenario"])
+                        elif stage_name == "frame_bytes":
+                            analysis_result["frame_bytes"] = output
+                            render_visual_guide(output)
+
+                        progress_bar.progress(int(100 * len(analysis_result) / len(stage_messages)))
+                        status_text.text(stage_messages[stage_name])
+
+                    def on_stage_update(stage_name, partial_output):
+                        # Show the verdict as soon as it streams in, ahead of the long analysis
+                        # Partial output is unvalidated model JSON, so skip fields of the wrong type
+                        if stage_name == "scam_json":
+                            if isinstance(partial_output.get("risk_level"), str):
+                                render_threat_metrics(partial_output)
+                            scam_phrases = partial_output.get("scam_phrases")
+                            if isinstance(scam_phrases, list):
+                                render_extracted_text(analysis_result.get("extracted_text", ""),
+                                                      [phrase for phrase in scam_phrases if isinstance(phrase, str)])
+                        # Show streamed text with a typing cursor until the stage completes
+                        elif stage_name == "educational_content":
+                            if partial_output.get("narration"):
+                                render_narration(partial_output["narration"] + "▌")
+                            if partial_output.get("what_if_scenario"):
+                                render_what_if(partial_output["what_if_scenario"] + "▌")
+
+                    status_text.text("🔍 Extracting text from image...")
+                    if job_queue:
+                        # The worker caches the result itself
+                        job_id = job_queue.submit(file_bytes, upload_digest)
+                        job_queue.wait_for_result(job_id, on_stage_complete=on_stage_complete, on_stage_update=on_stage_update)
+                    else:
+                        pipeline = build_analysis_pipeline(file_bytes)
+                        pipeline.run(on_stage_complete=on_stage_complete, on_stage_update=on_stage_update)
+                        result_cache.set(upload_digest, analysis_result)
+                    rendered_progressively = True
+
+                st.session_state["home_analysis"] = {"upload_key": upload_key, "result": analysis_result}
+
+            scam_json = analysis_result["scam_json"]
+
+            # Session memo and cache hits are complete already, so fill every section at once
+            if not rendered_progressively:
+                render_threat_metrics(scam_json)
+                render_extracted_text(analysis_result.get("extracted_text", ""), scam_json.get("scam_phrases", []))
+                render_narration(analysis_result["narration"])
+                render_what_if(analysis_result["what_if_scenario"])
+                render_visual_guide(analysis_result["frame_bytes"])
+
+            progress_bar.progress(100)
+            
+            # Clear processing indicators
+            status_text.empty()
+            progress_bar.empty()
 
             # Success message
             st.markdown("""
@@ -1971,20 +2187,30 @@ def show_home_page():
             
             with col1[0]:
                 if st.button("📫 Post", key="save_btn", use_container_width=True):
-                    if save_to_history(scam_json, file_bytes, redis_client):
+                    analysis_id = save_to_history(scam_json, file_bytes, redis_client, analysis_result.get("extracted_text", ""))
+                    if analysis_id:
+                        # Kept with this upload's analysis, so a later upload does not inherit it
+                        st.session_state["home_analysis"]["saved_id"] = analysis_id
                         st.success("✅ Analysis saved to history!")
                     else:
                         st.error("❌ Failed to save to history. Redis connection required.")
+
+            # The analysis just posted is in the index too
+            show_similar_scams(analysis_result.get("extracted_text", ""), scam_json, key="home_similar",
+                               exclude_id=st.session_state["home_analysis"].get("saved_id"))
             # -----------------------------
             # Cleanup temporary files
             # -----------------------------
-            for file_path in [input_path, edu_image_path]:
+            for file_path in [input_path]:
                 try:
                     os.unlink(file_path)
                 except Exception:
                     pass
 
         else:
+            # Drop the memoized analysis once the upload is cleared
+            st.session_state.pop("home_analysis", None)
+
             # Instructions when no file is uploaded
             st.markdown("""
             <div class="instructions-container">
@@ -0,0 +1,149 @@
+"""
+Recall and latency benchmark for the similar-scams HNSW index.
+
+Builds throwaway in-memory Chroma collections over random unit vectors (or
+the vectors of an existing collection) for every combination of the given
+HNSW parameters, and compares their top-k results against an exact
+brute-force search. Each vector gets one of ``--facet-values`` scam types,
+and every configuration is measured both unfiltered and with the
+``scam_type`` filter the "Same scam type" panel uses:
+
+    python benchmark_ann.py --count 100000 --m 16 32 --search-ef 32 64 128
+
+Use the best trade-off as ``HISTORY_ANN_M``, ``HISTORY_ANN_CONSTRUCTION_EF``
+and ``HISTORY_ANN_SEARCH_EF``.
+"""
+
+import time
+import uuid
+import logging
+import argparse
+import itertools
+import numpy as np
+import chromadb
+
+logger = logging.getLogger(__name__)
+
+# Rows per add call, below Chroma's maximum batch size
+ADD_BATCH_SIZE = 5000
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Clustered unit vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(clusters, size=count)] + 0.5 * rng.standard_normal((count, dim))
+    return normalize(vectors)
+
+
+def collection_vectors(persist_directory: str, name: str, limit: int) -> np.ndarray:
+    """Vectors stored in an existing collection."""
+    client = chromadb.PersistentClient(path=persist_directory)
+    rows = client.get_collection(name).get(limit=limit, include=["embeddings"])
+    return normalize(np.asarray(rows["embeddings"], dtype=np.float32))
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int, mask: np.ndarray = None) -> np.ndarray:
+    """Indices of the true top-k by cosine similarity, among the vectors ``mask`` allows per query."""
+    scores = queries @ vectors.T
+    if mask is not None:
+        scores = np.where(mask, scores, -np.inf)
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def measure_queries(collection, queries: np.ndarray, truth: np.ndarray, k: int, where_values=None) -> dict:
+    """Recall and latency of ``queries``, each filtered to its scam type if ``where_values`` is given."""
+    latencies, hits = [], 0
+    for i, (query, expected) in enumerate(zip(queries, truth)):
+        where = {"scam_type": where_values[i]} if where_values is not None else None
+        started = time.monotonic()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, where=where, include=[])
+        latencies.append((time.monotonic() - started) * 1000)
+        hits += len(set(map(int, result["ids"][0])) & set(expected.tolist()))
+    return {
+        "recall": hits / truth.size,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def run(vectors: np.ndarray, facets: np.ndarray, queries: np.ndarray, query_facets: np.ndarray,
+        truth: np.ndarray, filtered_truth: np.ndarray, k: int,
+        m: int, construction_ef: int, search_ef: int) -> dict:
+    """Build one index and measure it unfiltered and filtered."""
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(
+        f"bench_{uuid.uuid4().hex}",
+        metadata={"hnsw:space": "cosine", "hnsw:M": m,
+                  "hnsw:construction_ef": construction_ef, "hnsw:search_ef": search_ef},
+    )
+
+    started = time.monotonic()
+    for start in range(0, len(vectors), ADD_BATCH_SIZE):
+        chunk = vectors[start:start + ADD_BATCH_SIZE]
+        collection.add(
+            ids=[str(i) for i in range(start, start + len(chunk))],
+            embeddings=chunk.tolist(),
+            metadatas=[{"scam_type": f"type{facet}"} for facet in facets[start:start + len(chunk)]],
+        )
+    build_seconds = time.monotonic() - started
+
+    results = {
+        "unfiltered": measure_queries(collection, queries, truth, k),
+        "filtered": measure_queries(collection, queries, filtered_truth, k,
+                                    [f"type{facet}" for facet in query_facets]),
+    }
+    client.delete_collection(collection.name)
+    return {"build_s": build_seconds, **results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HNSW settings of the similar-scams index")
+    parser.add_argument("--count", type=int, default=50000, help="Indexed vectors")
+    parser.add_argument("--dim", type=int, default=3072, help="Dimensions of synthetic vectors")
+    parser.add_argument("--clusters", type=int, default=200, help="Clusters of synthetic vectors")
+    parser.add_argument("--facet-values", type=int, default=20, help="Distinct scam types for the filtered case")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per configuration")
+    parser.add_argument("-k", type=int, default=5, help="Neighbours per query")
+    parser.add_argument("--m", type=int, nargs="+", default=[16], help="HNSW M values")
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[200], help="construction_ef values")
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[16, 64, 128], help="search_ef values")
+    parser.add_argument("--from-collection", help="Benchmark the vectors of this collection instead")
+    parser.add_argument("--persist-directory", default="meme_db", help="Chroma directory of --from-collection")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.from_collection:
+        vectors = collection_vectors(args.persist_directory, args.from_collection, args.count)
+    else:
+        vectors = synthetic_vectors(args.count, args.dim, args.clusters, args.seed)
+    # Queries are perturbed copies of indexed vectors, like re-posted scams
+    rng = np.random.default_rng(args.seed + 1)
+    picked_ids = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    picked = vectors[picked_ids]
+    queries = normalize(picked + 0.05 * rng.standard_normal(picked.shape).astype(np.float32))
+    facets = rng.integers(args.facet_values, size=len(vectors))
+    query_facets = facets[picked_ids]
+    truth = exact_neighbours(vectors, queries, args.k)
+    filtered_truth = exact_neighbours(vectors, queries, args.k, facets[None, :] == query_facets[:, None])
+    logger.info(f"{len(vectors)} vectors of {vectors.shape[1]} dimensions, {len(queries)} queries, k={args.k}")
+
+    print(f"{'M':>4} {'constr_ef':>9} {'search_ef':>9} {'filter':>10} {'recall':>7} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'build s':>8}")
+    for m, construction_ef, search_ef in itertools.product(args.m, args.construction_ef, args.search_ef):
+        result = run(vectors, facets, queries, query_facets, truth, filtered_truth, args.k,
+                     m, construction_ef, search_ef)
+        for case in ("unfiltered", "filtered"):
+            print(f"{m:>4} {construction_ef:>9} {search_ef:>9} {case:>10} {result[case]['recall']:>7.3f} "
+                  f"{result[case]['p50_ms']:>7.2f} {result[case]['p95_ms']:>7.2f} {result['build_s']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
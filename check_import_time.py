@@ -0,0 +1,117 @@
+"""
+Import-time budget for the modules loaded at app and worker startup.
+
+Each module is imported in a fresh interpreter under ``python -X importtime``
+and its cumulative import time (median of several runs) is compared with its
+budget. Standard library modules that every entry point loads anyway are
+imported first, so the budgets cover only what the module itself adds. The
+heavy client libraries must not be loaded by any of them; they are imported
+on first use. Exits non-zero on a regression:
+
+    python check_import_time.py
+    python check_import_time.py --scale 2   # on a slow machine
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+# Cumulative import time budget per module, in milliseconds
+BUDGETS_MS = {
+    "agents.pipeline": 15,
+    "agents.result_cache": 15,
+    "agents.job_queue": 15,
+    "agents.history_store": 20,
+    "agents.similar_scams": 20,
+    "agents.semantic_cache": 10,
+    "agents.clients": 10,
+}
+
+# Loaded by streamlit, worker.py and manage.py before any agent module
+BASELINE_IMPORTS = "os, re, json, time, logging, threading, typing, datetime, tempfile, concurrent.futures"
+
+# Libraries that only the analysis, vector store and media code paths need
+HEAVY_MODULES = (
+    "openai", "langchain", "langchain_core", "langchain_openai", "chromadb",
+    "elevenlabs", "numpy", "PIL", "httpx",
+)
+
+
+def measure(module: str) -> Tuple[Dict[str, int], List[str]]:
+    """
+    Import ``module`` in a fresh interpreter.
+
+    Returns:
+        Tuple of (cumulative microseconds of ``module`` and of each module
+        it imported, names of every module loaded)
+    """
+    code = f"import sys, {BASELINE_IMPORTS}; import {module}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True,
+        # The agents package is resolved from the repo root, wherever this is run from
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    # Entries are printed after their dependencies, indented two spaces per level
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, total, name = line[len("import time:"):].split("|")
+        entries.append((name.strip(), len(name) - len(name.lstrip()), int(total)))
+
+    # The module's subtree is the run of deeper entries right before it
+    end = next(i for i, (name, _, _) in enumerate(entries) if name == module)
+    start = end
+    while start > 0 and entries[start - 1][1] > entries[end][1]:
+        start -= 1
+    cumulative = {name: total for name, _, total in entries[start:end + 1]}
+    return cumulative, json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check module import times against their budgets")
+    parser.add_argument("--runs", type=int, default=5, help="Imports per module; the median is used")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier applied to every budget")
+    parser.add_argument("--top", type=int, default=5, help="Slowest dependencies shown per module")
+    args = parser.parse_args()
+
+    failures = []
+    for module, budget_ms in BUDGETS_MS.items():
+        try:
+            runs = [measure(module) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"FAIL {module:<24} import failed")
+            failures.append(f"{module} failed to import: {str(e)}")
+            continue
+        elapsed_ms = statistics.median(timings[module] for timings, _ in runs) / 1000
+        limit_ms = budget_ms * args.scale
+        heavy = sorted({name.split(".")[0] for name in runs[0][1]} & set(HEAVY_MODULES))
+
+        status = "ok" if elapsed_ms <= limit_ms and not heavy else "FAIL"
+        print(f"{status:>4} {module:<24} {elapsed_ms:7.1f} ms (budget {limit_ms:.0f} ms)")
+        slowest = sorted(
+            ((name, us) for name, us in runs[0][0].items() if name != module),
+            key=lambda item: -item[1],
+        )
+        for name, us in slowest[:args.top]:
+            print(f"{'':>4}   {name:<40} {us / 1000:7.1f} ms")
+
+        if elapsed_ms > limit_ms:
+            failures.append(f"{module} took {elapsed_ms:.1f} ms, over its {limit_ms:.0f} ms budget")
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)} at import time")
+
+    for failure in failures:
+        print(f"error: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
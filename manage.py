@@ -0,0 +1,130 @@
+"""
+Maintenance commands for TruthLoop's Redis data.
+
+    python manage.py backfill-thumbnails
+    python manage.py migrate-images
+    python manage.py migrate-records
+    python manage.py backfill-indexes
+    python manage.py semantic-cache-stats
+    python manage.py import-vectors scams.jsonl --workers 4
+    python manage.py index-similar
+"""
+
+import logging
+import argparse
+from dotenv import load_dotenv
+from agents.clients import get_redis_client
+from agents.history_store import HistoryStore
+from agents.semantic_cache import SemanticVerdictCache
+
+logger = logging.getLogger(__name__)
+
+
+def get_history_store() -> HistoryStore:
+    """History store on the shared text and binary Redis connections."""
+    return HistoryStore(get_redis_client(), get_redis_client(decode_responses=False))
+
+
+def backfill_thumbnails(args):
+    """Generate thumbnails for history records saved before they existed."""
+    written = get_history_store().backfill_thumbnails(batch_size=args.batch_size)
+    logger.info(f"Wrote {written} thumbnails")
+
+
+def migrate_images(args):
+    """Rewrite base64 history images as raw bytes."""
+    migrated = get_history_store().migrate_images(batch_size=args.batch_size)
+    logger.info(f"Migrated images of {migrated} records")
+
+
+def migrate_records(args):
+    """Rewrite legacy JSON history records in the binary record format."""
+    converted = get_history_store().migrate_records(batch_size=args.batch_size)
+    logger.info(f"Converted {converted} records")
+
+
+def backfill_indexes(args):
+    """Add history records saved before the statistics and filter indexes existed."""
+    added = get_history_store().backfill_indexes(batch_size=args.batch_size)
+    logger.info(f"Added {added} records to the feed statistics and filter indexes")
+
+
+def semantic_cache_stats(args):
+    """Report how often detection verdicts were reused across all processes."""
+    stats = SemanticVerdictCache(redis_client=get_redis_client()).stats()
+    logger.info(f"Semantic cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.1%} hit rate)")
+
+
+def import_vectors(args):
+    """Bulk-import a JSONL/CSV corpus of scam samples into the vector store."""
+    from agents import vectorstore
+    from agents.vector_import import bulk_import
+
+    collection = vectorstore.get_collection(args.collection) if args.collection else vectorstore.get_db()
+    imported = bulk_import(
+        args.path,
+        collection,
+        text_field=args.text_field,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        checkpoint_path=args.checkpoint,
+    )
+    logger.info(f"Imported {imported} rows")
+
+
+def index_similar(args):
+    """Add saved analyses to the similar-scams index and drop expired ones."""
+    from agents import similar_scams
+
+    similar_scams.prune_expired()
+    indexed = similar_scams.index_history(get_history_store(), batch_size=args.batch_size)
+    logger.info(f"Indexed {indexed} analyses for similar-scam lookups")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TruthLoop maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill = subparsers.add_parser("backfill-thumbnails", help="Build missing history grid thumbnails")
+    backfill.add_argument("--batch-size", type=int, default=100, help="Records checked per round trip")
+    backfill.set_defaults(func=backfill_thumbnails)
+
+    migrate = subparsers.add_parser("migrate-images", help="Store base64 history images as raw bytes")
+    migrate.add_argument("--batch-size", type=int, default=100, help="Records read per round trip")
+    migrate.set_defaults(func=migrate_images)
+
+    records = subparsers.add_parser("migrate-records", help="Convert JSON history records to the binary format")
+    records.add_argument("--batch-size", type=int, default=100, help="Records read per round trip")
+    records.set_defaults(func=migrate_records)
+
+    indexes = subparsers.add_parser("backfill-indexes",
+                                    help="Add existing history records to the feed statistics and filters")
+    indexes.add_argument("--batch-size", type=int, default=100, help="Records read per round trip")
+    indexes.set_defaults(func=backfill_indexes)
+
+    semantic = subparsers.add_parser("semantic-cache-stats", help="Show semantic verdict cache hit rate")
+    semantic.set_defaults(func=semantic_cache_stats)
+
+    vectors = subparsers.add_parser("import-vectors", help="Bulk-import scam samples into the vector store")
+    vectors.add_argument("path", help="Corpus file (.jsonl or .csv)")
+    vectors.add_argument("--text-field", default="text", help="Field holding the text to embed")
+    vectors.add_argument("--collection", help="Target collection (default: the meme DB)")
+    vectors.add_argument("--batch-size", type=int, default=256, help="Texts per embedding request")
+    vectors.add_argument("--workers", type=int, default=4, help="Embedding requests in flight")
+    vectors.add_argument("--checkpoint", help="Progress file for resuming (default: <path>.checkpoint)")
+    vectors.set_defaults(func=import_vectors)
+
+    similar = subparsers.add_parser("index-similar", help="Index saved analyses for similar-scam lookups")
+    similar.add_argument("--batch-size", type=int, default=100, help="Records read per round trip")
+    similar.set_defaults(func=index_similar)
+
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
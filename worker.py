@@ -0,0 +1,121 @@
+"""
+Background worker for the home-page analysis pipeline.
+
+Claims jobs submitted by the Streamlit app from the Redis job queue, runs
+OCR → detection → educational content and publishes each stage result back
+to the job as soon as it is ready. Run as many workers, on as many machines,
+as needed:
+
+    python worker.py --threads 4
+"""
+
+import os
+import time
+import socket
+import logging
+import argparse
+import threading
+from dotenv import load_dotenv
+from agents.clients import get_redis_client
+from agents.job_queue import JobQueue
+from agents.result_cache import ResultCache
+from agents.pipeline import build_analysis_pipeline
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between partial-output writes for one stage
+PARTIAL_PUBLISH_INTERVAL = 0.25
+
+
+def process_job(job_queue: JobQueue, result_cache: ResultCache, job_id: str):
+    """Run the analysis pipeline for one claimed job."""
+    try:
+        image_bytes = job_queue.get_image(job_id)
+        if not image_bytes:
+            raise ValueError("Job image is missing or expired")
+
+        last_partial = {}
+
+        def on_stage_complete(stage_name, output):
+            job_queue.publish_stage(job_id, stage_name, output)
+            job_queue.heartbeat(job_id)
+
+        def on_stage_update(stage_name, partial_output):
+            now = time.monotonic()
+            if now - last_partial.get(stage_name, 0) >= PARTIAL_PUBLISH_INTERVAL:
+                last_partial[stage_name] = now
+                job_queue.publish_partial(job_id, stage_name, partial_output)
+                job_queue.heartbeat(job_id)
+
+        outputs = build_analysis_pipeline(image_bytes).run(
+            on_stage_complete=on_stage_complete,
+            on_stage_update=on_stage_update,
+        )
+
+        digest = job_queue.redis.hget(f"job:{job_id}", "digest")
+        if digest:
+            result_cache.set(digest, {
+                "extracted_text": outputs["extracted_text"],
+                "scam_json": outputs["scam_json"],
+                "narration": outputs["narration"],
+                "what_if_scenario": outputs["what_if_scenario"],
+                "frame_bytes": outputs["frame_bytes"],
+            })
+        job_queue.complete(job_id)
+
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {str(e)}")
+        job_queue.fail(job_id, str(e))
+
+
+def run_worker(job_queue: JobQueue, result_cache: ResultCache, worker_id: str, stop_event: threading.Event):
+    """Claim and process jobs until ``stop_event`` is set."""
+    logger.info(f"Worker {worker_id} started")
+    while not stop_event.is_set():
+        try:
+            job_queue.requeue_expired()
+            job_id = job_queue.claim(worker_id)
+            if job_id:
+                process_job(job_queue, result_cache, job_id)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} error: {str(e)}")
+            time.sleep(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TruthLoop analysis worker")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("WORKER_THREADS", 2)),
+                        help="Jobs processed concurrently by this process")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    redis_client = get_redis_client()
+    job_queue = JobQueue(redis_client)
+    result_cache = ResultCache(redis_client, get_redis_client(decode_responses=False))
+
+    stop_event = threading.Event()
+    threads = [
+        threading.Thread(
+            target=run_worker,
+            args=(job_queue, result_cache, f"{socket.gethostname()}:{os.getpid()}:{i}", stop_event),
+            daemon=True,
+        )
+        for i in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info("Shutting down; waiting for in-flight jobs")
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+
+
+if __name__ == "__main__":
+    main()